@@ -37,4 +37,10 @@ admin.site.register(Exchange)
 admin.site.register(ExchangeOfferedRecord)
 admin.site.register(ExchangeRecordRequestedByReceiver)
 admin.site.register(Wishlist)
+admin.site.register(WishlistMatch)
 admin.site.register(Location)
+admin.site.register(GeocodeCacheEntry)
+admin.site.register(RateLimitBucket)
+admin.site.register(ChangeMarker)
+admin.site.register(CatalogCounter)
+admin.site.register(OutboxEvent)
@@ -0,0 +1,117 @@
+from collections import defaultdict
+
+from django.db import connection, transaction
+
+from .conditional import RECORDS_MARKER, bump_marker
+from .models import CatalogCounter, Record, Wishlist, normalize_catalog_number
+
+# Adds the deltas to the counters, creating missing rows. Counts never go
+# below zero; drift is corrected by reconcile_counters(). New rows start
+# from the clamped deltas, so the signed deltas of existing rows are
+# looked up again instead of taken from EXCLUDED.
+_ADJUST_SQL = """
+    WITH deltas (catalog_key, record_delta, wishlist_delta) AS (VALUES {values})
+    INSERT INTO {table} (catalog_key, record_count, wishlist_count, updated_at)
+    SELECT catalog_key, GREATEST(record_delta, 0), GREATEST(wishlist_delta, 0), now()
+    FROM deltas
+    ON CONFLICT (catalog_key) DO UPDATE SET
+        record_count = GREATEST({table}.record_count + (
+            SELECT record_delta FROM deltas WHERE deltas.catalog_key = EXCLUDED.catalog_key
+        ), 0),
+        wishlist_count = GREATEST({table}.wishlist_count + (
+            SELECT wishlist_delta FROM deltas WHERE deltas.catalog_key = EXCLUDED.catalog_key
+        ), 0),
+        updated_at = now()
+"""
+
+_VALUES_SQL = '(%s, %s::integer, %s::integer)'
+
+# Actual counts of every catalog key that has a record or a wishlist entry
+_ACTUAL_SQL = """
+    SELECT catalog_key, SUM(records) AS record_count, SUM(wishlists) AS wishlist_count
+    FROM (
+        SELECT catalog_key, COUNT(*) AS records, 0 AS wishlists
+        FROM {record_table} GROUP BY catalog_key
+        UNION ALL
+        SELECT catalog_key, 0, COUNT(*)
+        FROM {wishlist_table} GROUP BY catalog_key
+    ) counts
+    GROUP BY catalog_key
+"""
+
+
+def adjust_counters(records=None, wishlists=None):
+    """
+    Add the given per-catalog-key deltas ({catalog_key: delta}) to the
+    record and wishlist counts with a single statement.
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    for key, delta in (records or {}).items():
+        deltas[key][0] += delta
+    for key, delta in (wishlists or {}).items():
+        deltas[key][1] += delta
+
+    # Sorted, so concurrent adjustments lock the rows in the same order
+    rows = [(key, *delta) for key, delta in sorted(deltas.items()) if any(delta)]
+    if not rows:
+        return
+
+    sql = _ADJUST_SQL.format(
+        table=connection.ops.quote_name(CatalogCounter._meta.db_table),
+        values=', '.join([_VALUES_SQL] * len(rows))
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [value for row in rows for value in row])
+
+    # Record payloads show the counts
+    bump_marker(RECORDS_MARKER)
+
+
+def get_counts(catalog_number):
+    """
+    Return (record_count, wishlist_count) of a catalog number.
+    """
+    counts = CatalogCounter.objects.filter(
+        catalog_key=normalize_catalog_number(catalog_number)
+    ).values_list('record_count', 'wishlist_count').first()
+    return counts or (0, 0)
+
+
+def reconcile_counters():
+    """
+    Recompute every counter from the records and wishlists, fixing rows
+    that drifted (e.g. through queryset updates, which send no signals).
+    The counter table is locked against writes meanwhile, so no concurrent
+    adjustment is lost. Returns the number of rows corrected and deleted.
+    """
+    quote_name = connection.ops.quote_name
+    table = quote_name(CatalogCounter._meta.db_table)
+    record_table = quote_name(Record._meta.db_table)
+    wishlist_table = quote_name(Wishlist._meta.db_table)
+    actual = _ACTUAL_SQL.format(record_table=record_table, wishlist_table=wishlist_table)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {table} IN EXCLUSIVE MODE')
+
+        cursor.execute(f"""
+            INSERT INTO {table} (catalog_key, record_count, wishlist_count, updated_at)
+            SELECT catalog_key, record_count, wishlist_count, now() FROM ({actual}) actual
+            ON CONFLICT (catalog_key) DO UPDATE SET
+                record_count = EXCLUDED.record_count,
+                wishlist_count = EXCLUDED.wishlist_count,
+                updated_at = now()
+            WHERE {table}.record_count <> EXCLUDED.record_count
+                OR {table}.wishlist_count <> EXCLUDED.wishlist_count
+        """)
+        corrected = cursor.rowcount
+
+        cursor.execute(f"""
+            DELETE FROM {table} c
+            WHERE NOT EXISTS (SELECT 1 FROM {record_table} r WHERE r.catalog_key = c.catalog_key)
+                AND NOT EXISTS (SELECT 1 FROM {wishlist_table} w WHERE w.catalog_key = c.catalog_key)
+        """)
+        deleted = cursor.rowcount
+
+    if corrected:
+        bump_marker(RECORDS_MARKER)
+    return corrected, deleted
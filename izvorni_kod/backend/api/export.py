@@ -0,0 +1,80 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+
+from .models import Record
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+
+EXPORT_CHUNK_SIZE = 2000
+
+# Record fields exported as they are
+EXPORT_FIELDS = (
+    'id',
+    'catalog_number',
+    'artist',
+    'album_name',
+    'release_year',
+    'additional_description',
+    'updated_at',
+)
+
+# Values of related objects, under names that do not clash with record
+# fields (values() rejects aliases named like a field)
+EXPORT_RELATED = {
+    'genre_name': F('genre__name'),
+    'record_grade': F('record_condition__abbreviation'),
+    'cover_grade': F('cover_condition__abbreviation'),
+    'city': F('location__city'),
+    'country': F('location__country'),
+    'owner': F('user__username'),
+}
+
+EXPORT_COLUMNS = EXPORT_FIELDS + tuple(EXPORT_RELATED)
+
+
+def export_rows(chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Iterate over all records as flat dicts keyed by EXPORT_COLUMNS. Rows
+    are fetched from a server-side cursor in chunks, so memory use does not
+    grow with the table.
+    """
+    return (
+        Record.objects.order_by('id')
+        .values(*EXPORT_FIELDS, **EXPORT_RELATED)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def iter_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+class _Echo:
+    """
+    File-like object whose write() returns the value, so csv.writer can
+    produce lines for streaming instead of buffering them.
+    """
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        yield writer.writerow(row[column] for column in EXPORT_COLUMNS)
+
+
+def iter_export(export_format, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Encoded export of all records in one of EXPORT_FORMATS.
+    """
+    rows = export_rows(chunk_size)
+    if export_format == 'csv':
+        return iter_csv(rows)
+    return iter_ndjson(rows)
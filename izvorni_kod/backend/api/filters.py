@@ -0,0 +1,72 @@
+from django.contrib.postgres.search import SearchQuery
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from .geo import filter_bbox, parse_bbox
+
+
+def build_search_query(text):
+    """
+    Parse free text the way web search engines do (quoted phrases, `or`,
+    `-` for exclusion) against the record search vector.
+    """
+    return SearchQuery(text, search_type='websearch', config='english')
+
+
+class RecordFilterBackend(BaseFilterBackend):
+    """
+    Filters record lists by the query parameters used in the filter panel,
+    search bar and map viewport. All conditions are combined into a single
+    SQL query.
+    """
+    integer_params = {
+        'release_year': 'release_year',
+        'genre': 'genre_id',
+        'cover_condition': 'cover_condition_id',
+        'record_condition': 'record_condition_id',
+    }
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+
+        for param, lookup in self.integer_params.items():
+            value = params.get(param)
+            if value:
+                queryset = queryset.filter(**{lookup: self._parse_int(param, value)})
+
+        artist = params.get('artist', '').strip()
+        if artist:
+            queryset = queryset.filter(artist__icontains=artist)
+
+        query = params.get('q', '').strip()
+        if query and not getattr(view, 'handles_search', False):
+            # Substring match, so the search bar finds records while typing
+            queryset = queryset.filter(
+                Q(artist__icontains=query) |
+                Q(album_name__icontains=query) |
+                Q(catalog_number__icontains=query)
+            )
+
+        if self._parse_bool(params.get('available_for_exchange')):
+            queryset = queryset.available()
+
+        if not getattr(view, 'handles_bbox', False):
+            bbox = parse_bbox(params)
+            if bbox is not None:
+                queryset = filter_bbox(queryset, 'location__coordinates', bbox)
+
+        return queryset
+
+    @staticmethod
+    def _parse_int(param, value):
+        try:
+            return int(value)
+        except ValueError:
+            raise ValidationError({
+                'message': f"Query parameter '{param}' must be an integer."
+            })
+
+    @staticmethod
+    def _parse_bool(value):
+        return str(value).lower() in ('1', 'true', 'yes')
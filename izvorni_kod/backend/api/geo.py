@@ -0,0 +1,114 @@
+import math
+
+from django.contrib.gis.db.models import PointField
+from django.contrib.gis.geos import Point, Polygon
+from django.db.models import FloatField, Func
+from django.db.models.functions import Cast
+from rest_framework.exceptions import ValidationError
+
+
+def as_geometry(expression):
+    """
+    Planar lon/lat view of a geography point. Location has a GiST index on
+    this expression, so bounding box filters on it are index scans.
+    """
+    return Cast(expression, PointField(srid=4326))
+
+
+class PointX(Func):
+    function = 'ST_X'
+    output_field = FloatField()
+
+
+class PointY(Func):
+    function = 'ST_Y'
+    output_field = FloatField()
+
+
+def parse_float_param(params, name, minimum, maximum, default=None):
+    """
+    Read a float query parameter and check that it lies in
+    [minimum, maximum]. Missing parameters fall back to default, or are an
+    error if there is no default.
+    """
+    value = params.get(name)
+    if value in (None, ''):
+        if default is None:
+            raise ValidationError({
+                'message': f"Query parameter '{name}' is required."
+            })
+        return default
+
+    try:
+        number = float(value)
+    except ValueError:
+        number = None
+    if number is None or not minimum <= number <= maximum:
+        raise ValidationError({
+            'message': f"Query parameter '{name}' must be a number between {minimum} and {maximum}."
+        })
+    return number
+
+
+def parse_point(params):
+    """
+    Build a WGS84 point from the 'lat' and 'lon' query parameters.
+    """
+    lat = parse_float_param(params, 'lat', -90, 90)
+    lon = parse_float_param(params, 'lon', -180, 180)
+    return Point(lon, lat, srid=4326)
+
+
+def parse_bbox(params, required=False):
+    """
+    Read the 'bbox' query parameter, 'min_lon,min_lat,max_lon,max_lat' in
+    degrees, as a tuple of floats. Returns None when it is missing and not
+    required. Boxes crossing the antimeridian are not supported.
+    """
+    value = params.get('bbox', '')
+    if not value:
+        if required:
+            raise ValidationError({
+                'message': "Query parameter 'bbox' is required."
+            })
+        return None
+
+    try:
+        bbox = tuple(float(part) for part in value.split(','))
+    except ValueError:
+        bbox = ()
+    if len(bbox) != 4 or not (
+        -180 <= bbox[0] < bbox[2] <= 180 and -90 <= bbox[1] < bbox[3] <= 90
+    ):
+        raise ValidationError({
+            'message': "Query parameter 'bbox' must be 'min_lon,min_lat,max_lon,max_lat' in degrees."
+        })
+    return bbox
+
+
+def snap_bbox(bbox, cell_size):
+    """
+    Grow the box outwards to whole grid cells of `cell_size` degrees.
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    return (
+        max(-180.0, math.floor(min_lon / cell_size) * cell_size),
+        max(-90.0, math.floor(min_lat / cell_size) * cell_size),
+        min(180.0, math.ceil(max_lon / cell_size) * cell_size),
+        min(90.0, math.ceil(max_lat / cell_size) * cell_size),
+    )
+
+
+def bbox_polygon(bbox):
+    polygon = Polygon.from_bbox(bbox)
+    polygon.srid = 4326
+    return polygon
+
+
+def filter_bbox(queryset, field, bbox):
+    """
+    Rows of the queryset whose point `field` lies in the bounding box.
+    """
+    return queryset.alias(
+        bbox_geometry=as_geometry(field)
+    ).filter(bbox_geometry__bboverlaps=bbox_polygon(bbox))
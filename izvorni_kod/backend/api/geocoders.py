@@ -0,0 +1,250 @@
+import csv
+import math
+import threading
+from array import array
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from geopy.exc import GeocoderRateLimited
+from geopy.geocoders import Nominatim
+
+from .ratelimit import RateLimitTimeout, TokenBucket
+
+UNKNOWN_ADDRESS = {
+    'address': 'Unknown Address',
+    'city': 'Unknown City',
+    'country': 'Unknown Country',
+}
+
+
+class NominatimGeocoder:
+    """
+    Geocoding through the public OpenStreetMap Nominatim service. Requests
+    from all processes share one token bucket set to its usage policy
+    (GEOCODER_RATE_LIMIT requests per second).
+    """
+    remote = True
+
+    def __init__(self, user_agent='location_serializer'):
+        self.geolocator = Nominatim(user_agent=user_agent)
+        self.bucket = TokenBucket(
+            'nominatim',
+            rate=settings.GEOCODER_RATE_LIMIT,
+            timeout=settings.GEOCODER_RATE_LIMIT_TIMEOUT
+        )
+
+    def _throttle(self):
+        try:
+            self.bucket.acquire()
+        except RateLimitTimeout as e:
+            raise GeocoderRateLimited(str(e))
+
+    def reverse(self, latitude, longitude):
+        """
+        Return a dict with the address, city and country for the coordinates.
+        """
+        self._throttle()
+        location = self.geolocator.reverse((latitude, longitude), exactly_one=True)
+        if not location:
+            return dict(UNKNOWN_ADDRESS)
+
+        address_data = location.raw.get('address', {})
+        return {
+            'address': location.address,
+            'city': address_data.get('city', UNKNOWN_ADDRESS['city']),
+            'country': address_data.get('country', UNKNOWN_ADDRESS['country']),
+        }
+
+    def geocode(self, query):
+        """
+        Return (latitude, longitude, address) for a place name, or None.
+        """
+        self._throttle()
+        location = self.geolocator.geocode(query, addressdetails=True)
+        if not location:
+            return None
+        return location.latitude, location.longitude, location.address
+
+
+def _unit_vector(latitude, longitude):
+    """
+    Point on the unit sphere. Straight-line distance between such points
+    grows with great-circle distance, so a Euclidean KD-tree over them
+    finds the geographically nearest point without dateline or pole
+    special cases.
+    """
+    lat = math.radians(latitude)
+    lon = math.radians(longitude)
+    return (
+        math.cos(lat) * math.cos(lon),
+        math.cos(lat) * math.sin(lon),
+        math.sin(lat),
+    )
+
+
+class KDTree:
+    """
+    Static 3-d tree stored implicitly in flat arrays: the node of the range
+    [lo, hi) is its middle element, with the left subtree in [lo, mid) and
+    the right one in [mid + 1, hi). No per-node objects are allocated.
+    """
+
+    def __init__(self, points):
+        order = list(range(len(points)))
+        self._build(points, order, 0, len(order), 0)
+
+        self.size = len(order)
+        # Index into the original points of every tree position
+        self.index = array('l', order)
+        self.coords = array('d')
+        for i in order:
+            self.coords.extend(points[i])
+
+    @classmethod
+    def _build(cls, points, order, lo, hi, depth):
+        if hi - lo <= 1:
+            return
+        axis = depth % 3
+        order[lo:hi] = sorted(order[lo:hi], key=lambda i: points[i][axis])
+        mid = (lo + hi) // 2
+        cls._build(points, order, lo, mid, depth + 1)
+        cls._build(points, order, mid + 1, hi, depth + 1)
+
+    def nearest(self, point):
+        """
+        Return the index (into the original points) of the point nearest to
+        `point`, or None for an empty tree.
+        """
+        if not self.size:
+            return None
+
+        coords = self.coords
+        best = [math.inf, -1]
+
+        def search(lo, hi, depth):
+            mid = (lo + hi) // 2
+            offset = mid * 3
+            dx = point[0] - coords[offset]
+            dy = point[1] - coords[offset + 1]
+            dz = point[2] - coords[offset + 2]
+            distance = dx * dx + dy * dy + dz * dz
+            if distance < best[0]:
+                best[0] = distance
+                best[1] = mid
+
+            axis = depth % 3
+            diff = point[axis] - coords[offset + axis]
+            if diff < 0:
+                near, far = (lo, mid), (mid + 1, hi)
+            else:
+                near, far = (mid + 1, hi), (lo, mid)
+
+            if near[0] < near[1]:
+                search(near[0], near[1], depth + 1)
+            # The other side can only hold a closer point if the splitting
+            # plane is nearer than the best match so far
+            if far[0] < far[1] and diff * diff < best[0]:
+                search(far[0], far[1], depth + 1)
+
+        search(0, self.size, 0)
+        return self.index[best[1]]
+
+
+class GazetteerGeocoder:
+    """
+    Offline geocoding against a local GeoNames-style city dump
+    (tab-separated; name in column 2, latitude and longitude in columns 5
+    and 6, country code in column 9 and population in column 15).
+    Country codes are translated with a GeoNames countryInfo.txt file when
+    one is configured.
+    """
+    remote = False
+
+    def __init__(self, path=None, country_info_path=None):
+        path = path or settings.GEOCODER_GAZETTEER_PATH
+        country_info_path = country_info_path or settings.GEOCODER_COUNTRY_INFO_PATH
+
+        countries = self._load_countries(country_info_path) if country_info_path else {}
+
+        self.cities = []
+        # Most populous city of each name, for forward lookups
+        self.by_name = {}
+        points = []
+        with open(path, encoding='utf-8', newline='') as gazetteer:
+            for row in csv.reader(gazetteer, delimiter='\t', quoting=csv.QUOTE_NONE):
+                if len(row) < 15 or row[0].startswith('#'):
+                    continue
+                name = row[1]
+                latitude, longitude = float(row[4]), float(row[5])
+                country_code = row[8]
+                population = int(row[14] or 0)
+
+                index = len(self.cities)
+                self.cities.append((
+                    name,
+                    countries.get(country_code, country_code),
+                    country_code,
+                    latitude,
+                    longitude,
+                ))
+                points.append(_unit_vector(latitude, longitude))
+
+                key = name.casefold()
+                current = self.by_name.get(key)
+                if current is None or population > current[1]:
+                    self.by_name[key] = (index, population)
+
+        self.tree = KDTree(points)
+
+    @staticmethod
+    def _load_countries(path):
+        countries = {}
+        with open(path, encoding='utf-8', newline='') as country_info:
+            for row in csv.reader(country_info, delimiter='\t', quoting=csv.QUOTE_NONE):
+                if len(row) > 4 and not row[0].startswith('#'):
+                    countries[row[0]] = row[4]
+        return countries
+
+    def reverse(self, latitude, longitude):
+        """
+        Return a dict with the nearest city and its country.
+        """
+        index = self.tree.nearest(_unit_vector(latitude, longitude))
+        if index is None:
+            return dict(UNKNOWN_ADDRESS)
+
+        city, country = self.cities[index][:2]
+        return {
+            'address': f'{city}, {country}',
+            'city': city,
+            'country': country,
+        }
+
+    def geocode(self, query):
+        """
+        Return (latitude, longitude, address) of the most populous city
+        named by the first part of `query` ("City, Country"), or None.
+        """
+        name = query.split(',')[0].strip().casefold()
+        match = self.by_name.get(name)
+        if match is None:
+            return None
+
+        city, country, _, latitude, longitude = self.cities[match[0]]
+        return latitude, longitude, f'{city}, {country}'
+
+
+_geocoder = None
+_geocoder_lock = threading.Lock()
+
+
+def get_geocoder():
+    """
+    The GEOCODER_BACKEND instance of this process, created on first use.
+    """
+    global _geocoder
+    if _geocoder is None:
+        with _geocoder_lock:
+            if _geocoder is None:
+                _geocoder = import_string(settings.GEOCODER_BACKEND)()
+    return _geocoder
@@ -0,0 +1,229 @@
+import threading
+from collections import Counter, OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+from geopy.exc import GeocoderRateLimited, GeocoderServiceError
+
+from .geocoders import UNKNOWN_ADDRESS, get_geocoder
+from .models import GeocodeCacheEntry, Location
+
+
+class LRUCache:
+    """
+    Small thread-safe least recently used mapping.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+MAX_GEOCODING_ATTEMPTS = 3
+
+# How long a worker may take to geocode a claimed location
+GEOCODING_LEASE = timedelta(minutes=5)
+
+# Wait before retrying a location after a geocoder error, doubled per attempt
+GEOCODING_RETRY_DELAY = timedelta(minutes=1)
+
+_memory_cache = LRUCache(settings.GEOCODE_CACHE_SIZE)
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def cache_key(latitude, longitude):
+    """
+    Coordinates rounded to GEOCODE_CACHE_PRECISION places, so nearby
+    lookups share one entry.
+    """
+    precision = settings.GEOCODE_CACHE_PRECISION
+    return f'{round(latitude, precision):.{precision}f},{round(longitude, precision):.{precision}f}'
+
+
+def cached_reverse_geocode(latitude, longitude):
+    """
+    Return the cached address, city and country for the coordinates, or
+    None when they are not cached. Never calls the geocoding service.
+    """
+    key = cache_key(latitude, longitude)
+
+    result = _memory_cache.get(key)
+    if result is not None:
+        _count('memory_hits')
+        return dict(result)
+
+    entry = GeocodeCacheEntry.objects.filter(key=key).values('address', 'city', 'country').first()
+    if entry is not None:
+        _count('db_hits')
+        _memory_cache.set(key, entry)
+        return dict(entry)
+
+    _count('misses')
+    return None
+
+
+def try_reverse_geocode(latitude, longitude):
+    """
+    Return the address, city and country for the coordinates if they can be
+    had without a request to a remote service, otherwise None.
+    """
+    geocoder = get_geocoder()
+    if not geocoder.remote:
+        return geocoder.reverse(latitude, longitude)
+    return cached_reverse_geocode(latitude, longitude)
+
+
+def reverse_geocode(latitude, longitude):
+    """
+    Return a dict with the address, city and country for the coordinates.
+    Checks the in-process LRU, then the database cache, and only calls the
+    configured geocoder on a miss. Geocoder errors propagate to the caller
+    and are not cached.
+    """
+    result = cached_reverse_geocode(latitude, longitude)
+    if result is not None:
+        return result
+
+    key = cache_key(latitude, longitude)
+    result = get_geocoder().reverse(latitude, longitude)
+    GeocodeCacheEntry.objects.get_or_create(key=key, defaults=result)
+    _memory_cache.set(key, result)
+    return dict(result)
+
+
+def _claim_pending_location():
+    """
+    Claim the next pending location for geocoding in a short transaction:
+    count the attempt and lease the row for GEOCODING_LEASE, so other
+    workers skip it without a lock being held during the remote call.
+    A worker that dies leaves the lease to expire.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        location = (
+            Location.objects.select_for_update(skip_locked=True)
+            .filter(geocoding_status=Location.GeocodingStatus.PENDING)
+            .filter(
+                models.Q(geocoding_claimed_until__isnull=True) |
+                models.Q(geocoding_claimed_until__lt=now)
+            )
+            .order_by('geocoding_attempts', 'id')
+            .first()
+        )
+        if location is not None:
+            location.geocoding_attempts += 1
+            location.geocoding_claimed_until = now + GEOCODING_LEASE
+            # A queryset update: the claim does not change what records show
+            Location.objects.filter(pk=location.pk).update(
+                geocoding_attempts=location.geocoding_attempts,
+                geocoding_claimed_until=location.geocoding_claimed_until
+            )
+    return location
+
+
+def geocode_pending_locations(limit):
+    """
+    Resolve up to `limit` pending locations one at a time and return how
+    many were processed. Each location is claimed first and geocoded
+    outside of any transaction; locations claimed by other workers are
+    skipped. Locations that keep failing are marked failed after
+    MAX_GEOCODING_ATTEMPTS, and are left claimed for a growing backoff
+    between attempts; the batch stops early when the geocoder is rate
+    limited.
+    """
+    processed = 0
+    while processed < limit:
+        location = _claim_pending_location()
+        if location is None:
+            break
+
+        try:
+            address_data = reverse_geocode(location.coordinates.y, location.coordinates.x)
+        except GeocoderRateLimited:
+            # Not the location's fault; release it for the next run
+            Location.objects.filter(pk=location.pk).update(
+                geocoding_attempts=location.geocoding_attempts - 1,
+                geocoding_claimed_until=None
+            )
+            break
+        except GeocoderServiceError:
+            if location.geocoding_attempts >= MAX_GEOCODING_ATTEMPTS:
+                for field, value in UNKNOWN_ADDRESS.items():
+                    setattr(location, field, value)
+                location.geocoding_status = Location.GeocodingStatus.FAILED
+                location.geocoding_claimed_until = None
+            else:
+                # Keep it claimed, so an outage does not use up every attempt
+                delay = GEOCODING_RETRY_DELAY * 2 ** (location.geocoding_attempts - 1)
+                location.geocoding_claimed_until = timezone.now() + delay
+        else:
+            for field, value in address_data.items():
+                setattr(location, field, value)
+            location.geocoding_status = Location.GeocodingStatus.RESOLVED
+            location.geocoding_claimed_until = None
+
+        # Saving also touches the records at this location (see signals)
+        location.save(update_fields=[
+            'address', 'city', 'country', 'geocoding_status',
+            'geocoding_claimed_until', 'updated_at'
+        ])
+
+        processed += 1
+    return processed
+
+
+def cache_stats():
+    """
+    Hit and miss counters of this process and the cache sizes.
+    """
+    with _stats_lock:
+        counters = {name: _stats[name] for name in ('memory_hits', 'db_hits', 'misses')}
+
+    lookups = sum(counters.values())
+    hits = counters['memory_hits'] + counters['db_hits']
+    return {
+        **counters,
+        'hit_rate': round(hits / lookups, 4) if lookups else None,
+        'memory_entries': len(_memory_cache),
+        'db_entries': GeocodeCacheEntry.objects.count(),
+        'precision': settings.GEOCODE_CACHE_PRECISION,
+    }
+
+
+def reset_cache():
+    """
+    Clear the in-process cache and counters (the database cache is kept).
+    """
+    _memory_cache.clear()
+    with _stats_lock:
+        _stats.clear()
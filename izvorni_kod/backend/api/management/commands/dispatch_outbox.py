@@ -0,0 +1,34 @@
+import time
+from django.core.management.base import BaseCommand
+from api.outbox import dispatch_pending, purge_events
+
+
+class Command(BaseCommand):
+    help = 'Dispatch pending outbox events, retrying failed ones with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--loop', action='store_true', help='Keep polling for due events')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to wait when nothing is due')
+        parser.add_argument(
+            '--purge-interval', type=float, default=3600.0,
+            help='Seconds between deletions of old dispatched and failed events'
+        )
+
+    def handle(self, *args, **options):
+        # Several workers may run at once: events are claimed with SKIP LOCKED
+        last_purge = None
+        while True:
+            if last_purge is None or time.monotonic() - last_purge >= options['purge_interval']:
+                purged = purge_events()
+                last_purge = time.monotonic()
+                if purged:
+                    self.stdout.write(f'Deleted {purged} old outbox events.')
+
+            processed = dispatch_pending(options['batch_size'])
+            if processed:
+                self.stdout.write(f'Processed {processed} outbox events.')
+            if not options['loop']:
+                break
+            if not processed:
+                time.sleep(options['interval'])
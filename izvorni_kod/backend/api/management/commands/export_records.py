@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from api.export import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, iter_export
+
+
+class Command(BaseCommand):
+    help = 'Export all records as NDJSON or CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='ndjson')
+        parser.add_argument('--output', help='Output file path (defaults to stdout)')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        chunks = iter_export(options['format'], chunk_size=options['chunk_size'])
+
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+                output.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
@@ -0,0 +1,24 @@
+import time
+from django.core.management.base import BaseCommand
+from api.geocoding import geocode_pending_locations
+
+
+class Command(BaseCommand):
+    help = 'Resolve addresses of pending locations within the geocoder rate limit'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new pending locations')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to wait when nothing is pending')
+
+    def handle(self, *args, **options):
+        # Several workers may run at once: rows are claimed with SKIP LOCKED
+        # and requests share the geocoder's rate limit bucket.
+        while True:
+            processed = geocode_pending_locations(options['batch_size'])
+            if processed:
+                self.stdout.write(f'Geocoded {processed} locations.')
+            if not options['loop']:
+                break
+            if not processed:
+                time.sleep(options['interval'])
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from api.models import Location, Record
+
+
+class Command(BaseCommand):
+    help = 'Recompute location grid keys and merge locations in the same grid cell'
+
+    def handle(self, *args, **options):
+        merged = 0
+
+        with transaction.atomic():
+            canonical = {}
+            updates = []
+            for location in Location.objects.select_for_update().order_by('id').iterator():
+                key = Location.grid_key_for(location.coordinates)
+                if key in canonical:
+                    Record.objects.filter(location_id=location.id).update(
+                        location_id=canonical[key], updated_at=timezone.now()
+                    )
+                    Location.objects.filter(id=location.id).delete()
+                    merged += 1
+                else:
+                    canonical[key] = location.id
+                    if key != location.grid_key:
+                        updates.append((location.id, key))
+
+            # Keys change when LOCATION_GRID_PRECISION does
+            for location_id, key in updates:
+                Location.objects.filter(id=location_id).update(grid_key=key)
+
+        self.stdout.write(f'Merged {merged} duplicate locations, updated {len(updates)} grid keys.')
@@ -1,6 +1,5 @@
 import os
 import random
-import time
 import uuid
 from django.contrib.gis.geos import Point
 from django.core.files import File
@@ -8,8 +7,8 @@ from django.core.management.base import BaseCommand
 from django.utils import lorem_ipsum
 from api.models import *
 from faker import Faker
-from geopy.geocoders import Nominatim
 from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+from api.geocoders import get_geocoder
 from api.models import Location
 
 
@@ -165,7 +164,8 @@ def get_or_create_cover_conditions():
 
 
 def get_or_create_locations():
-    geolocator = Nominatim(user_agent='real_location_populator')
+    # Uses GEOCODER_BACKEND, so the database can also be populated offline
+    geocoder = get_geocoder()
 
     places = [
         "Zagreb, Croatia",
@@ -191,10 +191,10 @@ def get_or_create_locations():
             continue 
 
         try:
-            location_data = geolocator.geocode(place, addressdetails=True)
+            location_data = geocoder.geocode(place)
             if location_data:
-                coordinates = Point(location_data.longitude, location_data.latitude)
-                address = location_data.address
+                latitude, longitude, address = location_data
+                coordinates = Point(longitude, latitude)
 
                 location = Location.objects.create(
                     address=address,
@@ -208,8 +208,6 @@ def get_or_create_locations():
             else:
                 # print(f"Could not find: {place}")
                 pass
-            
-            time.sleep(1)  # 1 second pause because of OSM request limit
 
         except (GeocoderTimedOut, GeocoderServiceError) as e:
             print(f"Error with {place}: {str(e)}")
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from api.matching import rebuild_matches
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the wishlist match table from records and wishlists'
+
+    def handle(self, *args, **options):
+        count = rebuild_matches()
+        self.stdout.write(f'Rebuilt {count} wishlist matches.')
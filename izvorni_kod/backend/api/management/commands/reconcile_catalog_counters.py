@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from api.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute the catalog counters from records and wishlists, fixing any drift'
+
+    def handle(self, *args, **options):
+        corrected, deleted = reconcile_counters()
+        self.stdout.write(f'Corrected {corrected} and deleted {deleted} catalog counters.')
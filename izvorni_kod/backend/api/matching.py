@@ -0,0 +1,70 @@
+from django.db import connection, transaction
+
+from .models import Record, Wishlist, WishlistMatch
+
+
+def match_record(record):
+    """
+    Recompute the wishlist matches of a record after it was created or its
+    catalog number changed.
+    """
+    wishlist_ids = Wishlist.objects.filter(
+        catalog_key=record.catalog_key
+    ).values_list('id', flat=True)
+
+    with transaction.atomic():
+        WishlistMatch.objects.filter(record=record).delete()
+        WishlistMatch.objects.bulk_create(
+            [WishlistMatch(wishlist_id=wishlist_id, record=record) for wishlist_id in wishlist_ids],
+            ignore_conflicts=True
+        )
+
+
+def match_wishlists(wishlists):
+    """
+    Recompute the matches of the given wishlist entries after they were
+    created or their catalog number changed.
+    """
+    wishlists = list(wishlists)
+    if not wishlists:
+        return
+
+    by_key = {}
+    for wishlist in wishlists:
+        by_key.setdefault(wishlist.catalog_key, []).append(wishlist)
+
+    records = Record.objects.filter(
+        catalog_key__in=list(by_key)
+    ).values_list('id', 'catalog_key')
+
+    matches = [
+        WishlistMatch(wishlist_id=wishlist.id, record_id=record_id)
+        for record_id, key in records
+        for wishlist in by_key[key]
+    ]
+
+    with transaction.atomic():
+        WishlistMatch.objects.filter(wishlist__in=wishlists).delete()
+        WishlistMatch.objects.bulk_create(matches, ignore_conflicts=True)
+
+
+def rebuild_matches():
+    """
+    Recreate the whole match table from the records and wishlists with a
+    single join. Returns the number of matches.
+    """
+    match_table = connection.ops.quote_name(WishlistMatch._meta.db_table)
+    wishlist_table = connection.ops.quote_name(Wishlist._meta.db_table)
+    record_table = connection.ops.quote_name(Record._meta.db_table)
+
+    with transaction.atomic():
+        WishlistMatch.objects.all().delete()
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                INSERT INTO {match_table} (wishlist_id, record_id, created_at)
+                SELECT w.id, r.id, now()
+                FROM {wishlist_table} w
+                JOIN {record_table} r
+                    ON r.catalog_key = w.catalog_key
+            """)
+            return cursor.rowcount
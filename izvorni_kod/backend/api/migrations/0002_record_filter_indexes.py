@@ -0,0 +1,33 @@
+# Generated by Django 5.1.4 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='record',
+            index=models.Index(fields=['user', 'id'], name='record_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='record',
+            index=models.Index(fields=['genre', 'id'], name='record_genre_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='record',
+            index=models.Index(fields=['release_year', 'id'], name='record_year_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='record',
+            index=models.Index(fields=['genre', 'release_year', 'id'], name='record_genre_year_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='record',
+            index=models.Index(fields=['record_condition', 'cover_condition', 'id'], name='record_conditions_id_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.4 on 2026-10-17 10:05
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_record_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='record',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=SearchVector('artist', weight='A', config='english') + SearchVector('album_name', weight='A', config='english') + SearchVector('additional_description', weight='B', config='english'), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='record',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='record_search_vector_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.4 on 2026-10-17 10:41
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_record_search_vector'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='record',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['catalog_number'], name='record_catalog_number_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='record',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['artist'], name='record_artist_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
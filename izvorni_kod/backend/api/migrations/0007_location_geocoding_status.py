@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-17 12:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_geocodecacheentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='geocoding_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('resolved', 'Resolved'), ('failed', 'Failed')], db_index=True, default='resolved', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='geocoding_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.4 on 2026-10-17 12:45
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+from api import geohash
+
+
+def merge_locations_by_grid_key(apps, schema_editor):
+    """
+    Set the grid key of every location and fold locations sharing a key
+    into the oldest one, repointing their records.
+    """
+    Location = apps.get_model('api', 'Location')
+    Record = apps.get_model('api', 'Record')
+
+    canonical = {}
+    for location in Location.objects.order_by('id').iterator():
+        key = geohash.encode(location.coordinates.y, location.coordinates.x, settings.LOCATION_GRID_PRECISION)
+        if key in canonical:
+            Record.objects.filter(location_id=location.id).update(
+                location_id=canonical[key], updated_at=timezone.now()
+            )
+            location.delete()
+        else:
+            canonical[key] = location.id
+            Location.objects.filter(id=location.id).update(grid_key=key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_location_geocoding_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='grid_key',
+            field=models.CharField(max_length=12, null=True),
+        ),
+        migrations.RunPython(merge_locations_by_grid_key, migrations.RunPython.noop),
+    ]
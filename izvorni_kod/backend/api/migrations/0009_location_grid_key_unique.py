@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-17 12:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_location_grid_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='location',
+            name='grid_key',
+            field=models.CharField(max_length=12, unique=True),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.4 on 2026-10-17 13:20
+
+import django.contrib.gis.db.models.fields
+import django.contrib.postgres.indexes
+import django.db.models.functions.comparison
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_location_grid_key_unique'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='location',
+            index=django.contrib.postgres.indexes.GistIndex(django.db.models.functions.comparison.Cast('coordinates', django.contrib.gis.db.models.fields.PointField(srid=4326)), name='location_coordinates_geom_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.4 on 2026-10-17 14:15
+
+import re
+
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+
+
+def normalize_catalog_number(catalog_number):
+    return re.sub(r'[\W_]+', '', catalog_number).casefold()
+
+
+def backfill_catalog_keys(apps, schema_editor):
+    for model_name, source in (('Record', 'catalog_number'), ('Wishlist', 'record_catalog_number')):
+        model = apps.get_model('api', model_name)
+        batch = []
+        for obj in model.objects.only('id', source).iterator(chunk_size=BATCH_SIZE):
+            obj.catalog_key = normalize_catalog_number(getattr(obj, source))
+            batch.append(obj)
+            if len(batch) == BATCH_SIZE:
+                model.objects.bulk_update(batch, ['catalog_key'])
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, ['catalog_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_ratelimitbucket'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='record',
+            name='catalog_key',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='wishlist',
+            name='catalog_key',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_catalog_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.4 on 2026-10-17 14:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_matches(apps, schema_editor):
+    WishlistMatch = apps.get_model('api', 'WishlistMatch')
+    Wishlist = apps.get_model('api', 'Wishlist')
+    Record = apps.get_model('api', 'Record')
+    quote_name = schema_editor.connection.ops.quote_name
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"""
+            INSERT INTO {quote_name(WishlistMatch._meta.db_table)} (wishlist_id, record_id, created_at)
+            SELECT w.id, r.id, now()
+            FROM {quote_name(Wishlist._meta.db_table)} w
+            JOIN {quote_name(Record._meta.db_table)} r
+                ON r.catalog_key = w.catalog_key
+        """)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_catalog_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WishlistMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('record', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='wishlist_matches', to='api.record')),
+                ('wishlist', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matches', to='api.wishlist')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('wishlist', 'record'), name='unique_wishlist_match')],
+            },
+        ),
+        migrations.AddField(
+            model_name='wishlist',
+            name='matched_records',
+            field=models.ManyToManyField(related_name='matching_wishlists', through='api.WishlistMatch', to='api.record'),
+        ),
+        migrations.RunPython(populate_matches, migrations.RunPython.noop),
+    ]
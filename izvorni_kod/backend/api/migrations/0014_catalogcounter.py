@@ -0,0 +1,46 @@
+# Generated by Django 5.1.4 on 2026-10-17 15:10
+
+from django.db import migrations, models
+
+
+def populate_counters(apps, schema_editor):
+    CatalogCounter = apps.get_model('api', 'CatalogCounter')
+    Wishlist = apps.get_model('api', 'Wishlist')
+    Record = apps.get_model('api', 'Record')
+    quote_name = schema_editor.connection.ops.quote_name
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"""
+            INSERT INTO {quote_name(CatalogCounter._meta.db_table)}
+                (catalog_key, record_count, wishlist_count, updated_at)
+            SELECT catalog_key, SUM(records), SUM(wishlists), now()
+            FROM (
+                SELECT catalog_key, COUNT(*) AS records, 0 AS wishlists
+                FROM {quote_name(Record._meta.db_table)} GROUP BY catalog_key
+                UNION ALL
+                SELECT catalog_key, 0, COUNT(*)
+                FROM {quote_name(Wishlist._meta.db_table)} GROUP BY catalog_key
+            ) counts
+            GROUP BY catalog_key
+        """)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_wishlistmatch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('catalog_key', models.CharField(max_length=255, unique=True)),
+                ('record_count', models.PositiveIntegerField(default=0)),
+                ('wishlist_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
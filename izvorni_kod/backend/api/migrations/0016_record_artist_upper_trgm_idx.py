@@ -0,0 +1,19 @@
+# Generated by Django 5.1.4 on 2026-10-17 16:10
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_outboxevent'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='record',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('artist'), name='gin_trgm_ops'), name='record_artist_upper_trgm_idx'),
+        ),
+    ]
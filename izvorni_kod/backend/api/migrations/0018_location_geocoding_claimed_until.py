@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-17 16:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_changemarker'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='geocoding_claimed_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.4 on 2026-10-17 17:10
+
+from collections import Counter
+
+from django.db import migrations
+from django.db.models import F, Min, Window
+from django.db.models.functions import Greatest
+
+
+def remove_duplicate_entries(apps, schema_editor):
+    """
+    Keep the oldest of each user's entries sharing a catalog key, dropping
+    their matches and their share of the catalog counters.
+    """
+    Wishlist = apps.get_model('api', 'Wishlist')
+    WishlistMatch = apps.get_model('api', 'WishlistMatch')
+    CatalogCounter = apps.get_model('api', 'CatalogCounter')
+
+    duplicates = list(
+        Wishlist.objects.annotate(
+            first_id=Window(Min('id'), partition_by=[F('user_id'), F('catalog_key')])
+        ).exclude(id=F('first_id')).values_list('id', 'catalog_key')
+    )
+    if not duplicates:
+        return
+
+    ids = [wishlist_id for wishlist_id, _ in duplicates]
+    WishlistMatch.objects.filter(wishlist_id__in=ids).delete()
+    Wishlist.objects.filter(id__in=ids).delete()
+
+    for key, count in Counter(key for _, key in duplicates).items():
+        CatalogCounter.objects.filter(catalog_key=key).update(
+            wishlist_count=Greatest(F('wishlist_count') - count, 0)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_location_geocoding_claimed_until'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_entries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.4 on 2026-10-17 17:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Separate from the deletions of 0019: PostgreSQL cannot alter a table
+    # with pending foreign key trigger events in the same transaction
+    dependencies = [
+        ('api', '0019_wishlist_remove_duplicate_keys'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='wishlist',
+            constraint=models.UniqueConstraint(fields=('user', 'catalog_key'), name='unique_catalog_key_per_user', violation_error_message="This record catalog number is already added to the user's wishlist."),
+        ),
+    ]
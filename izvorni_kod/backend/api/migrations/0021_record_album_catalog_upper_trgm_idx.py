@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-17 17:30
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_wishlist_unique_catalog_key'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='record',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('album_name'), name='gin_trgm_ops'), name='record_album_upper_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='record',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('catalog_number'), name='gin_trgm_ops'), name='record_catalog_upper_trgm_idx'),
+        ),
+    ]
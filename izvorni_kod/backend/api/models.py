@@ -1,9 +1,17 @@
+import re
+
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
-from django.db import models, transaction
-from django.db.models.functions import Lower
+from django.contrib.postgres.indexes import GinIndex, GistIndex, OpClass
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db import connections, models, transaction
+from django.db.models.functions import Coalesce, Lower, Upper
 from django.utils import timezone
 from django.contrib.gis.db.models import PointField
 
+from . import geohash
+from .geo import as_geometry
+
 class User(AbstractUser):
     email = models.EmailField(
         unique=True,
@@ -45,8 +53,113 @@ class User(AbstractUser):
         return f'{self.username} ({self.email})'
 
 
+def normalize_catalog_number(catalog_number):
+    """
+    Normalized form of a catalog number used for matching: case-folded,
+    with whitespace, punctuation and separators removed, so 'abc-123',
+    'ABC 123' and 'ABC-123' share the key 'abc123'.
+    """
+    return re.sub(r'[\W_]+', '', catalog_number).casefold()
+
+
+def _with_catalog_key(instance, source, kwargs):
+    """
+    Set instance.catalog_key from its `source` field, also saving it when
+    save() is limited to update_fields that include the source. The key
+    stored before is kept in `_previous_catalog_key` for the counters.
+    """
+    instance._previous_catalog_key = None if instance._state.adding else instance.catalog_key
+    instance.catalog_key = normalize_catalog_number(getattr(instance, source))
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and source in update_fields:
+        kwargs['update_fields'] = {*update_fields, 'catalog_key'}
+    return kwargs
+
+
+class RecordQuerySet(models.QuerySet):
+    # Related objects read by RecordSerializer, named after its output fields
+    SERIALIZER_SELECT_RELATED = (
+        'genre',
+        'record_condition',
+        'cover_condition',
+        'location',
+        'user'
+    )
+    SERIALIZER_PREFETCH_RELATED = ('photos',)
+
+    def for_serialization(self, fields=None):
+        """
+        Loading plan for RecordSerializer: joins the foreign keys, prefetches
+        photos and annotates availability, so any number of records is
+        serialized in a constant number of queries.
+        When `fields` is given, only what those output fields need is loaded.
+        """
+        def requested(name):
+            return fields is None or name in fields
+
+        queryset = self
+        select_related = [name for name in self.SERIALIZER_SELECT_RELATED if requested(name)]
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+
+        prefetch_related = [name for name in self.SERIALIZER_PREFETCH_RELATED if requested(name)]
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+
+        if requested('available_for_exchange'):
+            queryset = queryset.with_availability()
+
+        if requested('record_count') or requested('wishlist_count'):
+            queryset = queryset.with_catalog_counts()
+
+        return queryset
+
+    def with_availability(self):
+        """
+        Annotate each record with `exchange_available` using a single EXISTS
+        subquery, so availability can be read, filtered and sorted in SQL.
+        """
+        if 'exchange_available' in self.query.annotations:
+            return self
+
+        return self.annotate(
+            exchange_available=~models.Exists(
+                ExchangeOfferedRecord.objects.filter(
+                    record=models.OuterRef('pk'),
+                    exchange__completed=False
+                )
+            )
+        )
+
+    def with_catalog_counts(self):
+        """
+        Annotate each record with `catalog_record_count` and
+        `catalog_wishlist_count` read from its CatalogCounter row.
+        """
+        if 'catalog_wishlist_count' in self.query.annotations:
+            return self
+
+        counter = CatalogCounter.objects.filter(catalog_key=models.OuterRef('catalog_key'))
+        return self.annotate(
+            catalog_record_count=Coalesce(
+                models.Subquery(counter.values('record_count')[:1]), 0
+            ),
+            catalog_wishlist_count=Coalesce(
+                models.Subquery(counter.values('wishlist_count')[:1]), 0
+            )
+        )
+
+    def available(self):
+        """
+        Records that are not offered in any active (non-completed) exchange.
+        """
+        return self.with_availability().filter(exchange_available=True)
+
+
 class Record(models.Model):    
     catalog_number = models.CharField(max_length=255)
+    # Maintained in save() (see normalize_catalog_number())
+    catalog_key = models.CharField(max_length=255, db_index=True, editable=False)
 
     artist = models.CharField(max_length=255)
 
@@ -91,16 +204,78 @@ class Record(models.Model):
         on_delete=models.CASCADE,
         related_name='records'
     )
+
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    # Stored full-text document, kept up to date by the database on write
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector('artist', weight='A', config='english')
+            + SearchVector('album_name', weight='A', config='english')
+            + SearchVector('additional_description', weight='B', config='english')
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True
+    )
+
+    objects = RecordQuerySet.as_manager()
     
     class Meta:
         verbose_name = "Record"
         verbose_name_plural = "Records"
+        # Composite indexes for the common filter combinations of the record
+        # list. Each ends with 'id' so cursor pagination reads rows in order.
+        indexes = [
+            models.Index(fields=['user', 'id'], name='record_user_id_idx'),
+            models.Index(fields=['genre', 'id'], name='record_genre_id_idx'),
+            models.Index(fields=['release_year', 'id'], name='record_year_id_idx'),
+            models.Index(fields=['genre', 'release_year', 'id'], name='record_genre_year_id_idx'),
+            models.Index(
+                fields=['record_condition', 'cover_condition', 'id'],
+                name='record_conditions_id_idx'
+            ),
+            GinIndex(fields=['search_vector'], name='record_search_vector_idx'),
+            # Trigram indexes for typo-tolerant lookups (pg_trgm)
+            GinIndex(
+                fields=['catalog_number'],
+                name='record_catalog_number_trgm_idx',
+                opclasses=['gin_trgm_ops']
+            ),
+            GinIndex(
+                fields=['artist'],
+                name='record_artist_trgm_idx',
+                opclasses=['gin_trgm_ops']
+            ),
+            # Serve the artist filter and the list search: icontains
+            # compiles to UPPER(field) LIKE UPPER('%...%')
+            GinIndex(
+                OpClass(Upper('artist'), name='gin_trgm_ops'),
+                name='record_artist_upper_trgm_idx'
+            ),
+            GinIndex(
+                OpClass(Upper('album_name'), name='gin_trgm_ops'),
+                name='record_album_upper_trgm_idx'
+            ),
+            GinIndex(
+                OpClass(Upper('catalog_number'), name='gin_trgm_ops'),
+                name='record_catalog_upper_trgm_idx'
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        kwargs = _with_catalog_key(self, 'catalog_number', kwargs)
+        super().save(*args, **kwargs)
 
     @property
     def available_for_exchange(self):
         """
         Record is available for exchange only if it's not already offered in any active (non-completed) exchange.
+        Reads the `exchange_available` annotation when the record was loaded
+        through RecordQuerySet.with_availability().
         """
+        if hasattr(self, 'exchange_available'):
+            return self.exchange_available
+
         return not self.exchanges_where_offered.filter(
             exchange__completed=False
         ).exists()
@@ -112,6 +287,8 @@ class Record(models.Model):
 class Genre(models.Model):
     name = models.CharField(max_length=50)
 
+    updated_at = models.DateTimeField(auto_now=True)
+
     class Meta:
         verbose_name = "Genre"
         verbose_name_plural = "Genres"
@@ -134,6 +311,8 @@ class GoldmineConditionRecord(models.Model):
 
     description = models.TextField(blank=True)
 
+    updated_at = models.DateTimeField(auto_now=True)
+
     class Meta:
         verbose_name = "Goldmine Condition (Record)"
         verbose_name_plural = "Goldmine Conditions (Record)"
@@ -161,6 +340,8 @@ class GoldmineConditionCover(models.Model):
 
     description = models.TextField(blank=True)
 
+    updated_at = models.DateTimeField(auto_now=True)
+
     class Meta:
         verbose_name = "Goldmine Condition (Cover)"
         verbose_name_plural = "Goldmine Conditions (Cover)"
@@ -199,23 +380,217 @@ class Photo(models.Model):
 
 
 class Location(models.Model):
+    class GeocodingStatus(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        RESOLVED = 'resolved', 'Resolved'
+        FAILED = 'failed', 'Failed'
+
     address = models.CharField(max_length=255, blank=True)
     city = models.CharField(max_length=100, blank=True)
     country = models.CharField(max_length=100, blank=True)
     coordinates = PointField(geography=True, srid=4326)  # Geo coordinates
+    # Address fields of pending locations are filled in by the
+    # geocode_locations worker
+    geocoding_status = models.CharField(
+        max_length=10,
+        choices=GeocodingStatus.choices,
+        default=GeocodingStatus.RESOLVED,
+        db_index=True
+    )
+    geocoding_attempts = models.PositiveSmallIntegerField(default=0)
+    # Set while a worker geocodes the location, so others skip it
+    geocoding_claimed_until = models.DateTimeField(null=True, blank=True)
+    # Geohash of the grid cell holding the coordinates; points in the same
+    # cell share one location (see grid_key_for)
+    grid_key = models.CharField(max_length=12, unique=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Bounding box lookups in planar lon/lat (see api.geo.filter_bbox)
+            GistIndex(as_geometry('coordinates'), name='location_coordinates_geom_idx'),
+        ]
 
     def __str__(self):
         return self.address if self.address else f"{self.city}, {self.country}"
 
+    @staticmethod
+    def grid_key_for(point):
+        return geohash.encode(point.y, point.x, settings.LOCATION_GRID_PRECISION)
+
+    def save(self, *args, **kwargs):
+        if self.coordinates is not None:
+            self.grid_key = self.grid_key_for(self.coordinates)
+        super().save(*args, **kwargs)
+
+
+class GeocodeCacheEntry(models.Model):
+    """
+    Reverse geocoding result for coordinates rounded to
+    GEOCODE_CACHE_PRECISION decimal places (see api.geocoding).
+    """
+    key = models.CharField(max_length=64, unique=True)
+    address = models.CharField(max_length=255, blank=True)
+    city = models.CharField(max_length=100, blank=True)
+    country = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Geocode Cache Entry"
+        verbose_name_plural = "Geocode Cache Entries"
+
+    def __str__(self):
+        return f'{self.key}: {self.address}'
+
+
+class ChangeMarker(models.Model):
+    """
+    Version of a group of tables, moved forward after every committed
+    change to them, so conditional GETs read one row instead of
+    aggregating the tables (see api.conditional).
+    """
+    name = models.CharField(max_length=64, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f'{self.name}: {self.version}'
+
+
+class RateLimitBucket(models.Model):
+    """
+    Shared token bucket state for rate limits that span processes
+    (see api.ratelimit).
+    """
+    name = models.CharField(max_length=64, unique=True)
+    # Negative while callers are queued for future slots
+    tokens = models.FloatField()
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f'{self.name}: {self.tokens:.2f}'
+
+
+class CatalogCounter(models.Model):
+    """
+    Number of records and wishlist entries per normalized catalog number,
+    kept up to date by the save and delete signals (see api.counters).
+    """
+    catalog_key = models.CharField(max_length=255, unique=True)
+    record_count = models.PositiveIntegerField(default=0)
+    wishlist_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.catalog_key}: {self.record_count} records, {self.wishlist_count} wishlists'
+
+
+class OutboxEvent(models.Model):
+    """
+    Domain event written in the same transaction as the change it
+    describes and dispatched after the commit (see api.outbox).
+    """
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        DISPATCHED = 'dispatched', 'Dispatched'
+        FAILED = 'failed', 'Failed'
+
+    event_type = models.CharField(max_length=64)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.event_type} #{self.pk} ({self.status})'
+
+
+class WishlistQuerySet(models.QuerySet):
+    @staticmethod
+    def matched_records_prefetch():
+        """
+        Matched records with the RecordSerializer loading plan, fetched for
+        many entries through one join on the match table.
+        """
+        return models.Prefetch(
+            'matched_records',
+            queryset=Record.objects.for_serialization().order_by('id')
+        )
+
+    def for_serialization(self, fields=None):
+        """
+        Prefetch what WishlistSerializer reads for the given output fields
+        (all of them when fields is None).
+        """
+        if fields is not None and 'matching_records' not in fields:
+            return self
+        return self.prefetch_related(self.matched_records_prefetch())
+
+    def insert_missing(self, user, entries, batch_size=1000):
+        """
+        Insert {catalog_key: catalog_number} entries for the user with
+        INSERT ... ON CONFLICT (user_id, catalog_key) DO NOTHING and return
+        only the rows actually inserted, not those that already existed or
+        were added concurrently. Like bulk_create, this bypasses save() and
+        the post-save signals.
+        """
+        connection = connections[self.db]
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        items = list(entries.items())
+
+        inserted = []
+        with connection.cursor() as cursor:
+            for start in range(0, len(items), batch_size):
+                batch = items[start:start + batch_size]
+                cursor.execute(
+                    f"""
+                    INSERT INTO {table} (record_catalog_number, catalog_key, user_id)
+                    VALUES {', '.join(['(%s, %s, %s)'] * len(batch))}
+                    ON CONFLICT (user_id, catalog_key) DO NOTHING
+                    RETURNING id, record_catalog_number, catalog_key, user_id
+                    """,
+                    [value for key, number in batch for value in (number, key, user.pk)]
+                )
+                inserted.extend(
+                    self.model.from_db(
+                        self.db, ['id', 'record_catalog_number', 'catalog_key', 'user_id'], row
+                    )
+                    for row in cursor.fetchall()
+                )
+        return inserted
+
 
 class Wishlist(models.Model):
     record_catalog_number = models.CharField(max_length=255)
+    # Maintained in save() (see normalize_catalog_number())
+    catalog_key = models.CharField(max_length=255, db_index=True, editable=False)
 
     user = models.ForeignKey(
         'User',
         on_delete=models.CASCADE,
         related_name='wishlist'
     )
+
+    # Maintained by signals (see api.matching)
+    matched_records = models.ManyToManyField(
+        'Record',
+        through='WishlistMatch',
+        related_name='matching_wishlists'
+    )
+
+    objects = WishlistQuerySet.as_manager()
     
     class Meta:
         constraints = [
@@ -223,13 +598,88 @@ class Wishlist(models.Model):
                 fields=['record_catalog_number', 'user'],
                 name='unique_record_catalog_number_per_user',
                 violation_error_message='This record catalog number is already added to the user\'s wishlist.'
-            )
+            ),
+            # Also rules out spellings of the same catalog number
+            models.UniqueConstraint(
+                fields=['user', 'catalog_key'],
+                name='unique_catalog_key_per_user',
+                violation_error_message='This record catalog number is already added to the user\'s wishlist.'
+            ),
         ]
         
     def __str__(self):
         return f'Wishlist Item (ID: {self.pk}): {self.user} - {self.record_catalog_number}'
+
+    def save(self, *args, **kwargs):
+        kwargs = _with_catalog_key(self, 'record_catalog_number', kwargs)
+        super().save(*args, **kwargs)
             
 
+class WishlistMatch(models.Model):
+    """
+    A record whose catalog key equals the wishlist entry's.
+    """
+    wishlist = models.ForeignKey(
+        'Wishlist',
+        on_delete=models.CASCADE,
+        related_name='matches'
+    )
+
+    record = models.ForeignKey(
+        'Record',
+        on_delete=models.CASCADE,
+        related_name='wishlist_matches'
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['wishlist', 'record'],
+                name='unique_wishlist_match'
+            )
+        ]
+
+    def __str__(self):
+        return f'Wishlist Match: {self.wishlist_id} - {self.record_id}'
+
+
+class ExchangeQuerySet(models.QuerySet):
+    # Related objects read by ExchangeSerializer, named after its output fields
+    SERIALIZER_SELECT_RELATED = (
+        'initiator_user',
+        'receiver_user',
+        'next_user_to_review'
+    )
+    SERIALIZER_PREFETCH_RELATED = {
+        'requested_record': 'requested_record',
+        'offered_records': 'offered_records__record',
+        'records_requested_by_receiver': 'records_requested_by_receiver__record',
+    }
+
+    def for_serialization(self, fields=None):
+        """
+        Loading plan for ExchangeSerializer: joins the participants and
+        prefetches every nested record with the record loading plan.
+        When `fields` is given, only what those output fields need is loaded.
+        """
+        def requested(name):
+            return fields is None or name in fields
+
+        queryset = self
+        select_related = [name for name in self.SERIALIZER_SELECT_RELATED if requested(name)]
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+
+        records = Record.objects.for_serialization()
+        return queryset.prefetch_related(*[
+            models.Prefetch(lookup, queryset=records)
+            for name, lookup in self.SERIALIZER_PREFETCH_RELATED.items()
+            if requested(name)
+        ])
+
+
 class Exchange(models.Model):
     creation_datetime = models.DateTimeField(auto_now_add=True)
     last_modification_datetime = models.DateTimeField(auto_now=True)
@@ -260,6 +710,8 @@ class Exchange(models.Model):
     )
 
     completed = models.BooleanField(default=False)
+
+    objects = ExchangeQuerySet.as_manager()
     
     class Meta:
         verbose_name = "Exchange"
@@ -321,11 +773,11 @@ class Exchange(models.Model):
         # Transfer ownership of the offered records to the receiver
         for offered_record in self.offered_records.all():
             offered_record.record.user = self.receiver_user
-            offered_record.record.save(update_fields=['user'])
+            offered_record.record.save(update_fields=['user', 'updated_at'])
 
         # Transfer ownership of the requested record to the initiator
         self.requested_record.user = self.initiator_user
-        self.requested_record.save(update_fields=['user'])
+        self.requested_record.save(update_fields=['user', 'updated_at'])
 
         self.completed = True
         self.completed_datetime = timezone.now()
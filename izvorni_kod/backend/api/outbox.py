@@ -0,0 +1,175 @@
+import logging
+import queue
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import close_old_connections, models, transaction
+from django.utils import timezone
+
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+
+_queue = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def handler(event_type):
+    """
+    Register the decorated function as the handler of `event_type`. It is
+    called with the event payload as keyword arguments and returns the
+    EmailMessages to send.
+    """
+    def register(func):
+        _handlers[event_type] = func
+        return func
+    return register
+
+
+def publish(event_type, **payload):
+    """
+    Write an event in the current transaction. Unless
+    OUTBOX_DISPATCH_ON_COMMIT is off, the background dispatcher of this
+    process picks it up right after the commit; the dispatch_outbox worker
+    retries it if that fails or the process exits first.
+    """
+    event = OutboxEvent.objects.create(event_type=event_type, payload=payload)
+    if settings.OUTBOX_DISPATCH_ON_COMMIT:
+        transaction.on_commit(lambda: _put(event.pk))
+    return event
+
+
+def dispatch_pending(limit=None, ids=None):
+    """
+    Dispatch up to `limit` due pending events (only those in `ids` when
+    given), oldest first, sending all their emails over one connection.
+    Events are claimed in a short transaction and leased for OUTBOX_LEASE
+    seconds, so concurrent dispatchers skip them; emails are sent with no
+    transaction open and each result is saved right after its event.
+    Failures are retried with exponential backoff until
+    OUTBOX_MAX_ATTEMPTS. Delivery is at least once: an event whose result
+    was not saved (e.g. the dispatcher died) is sent again after its lease.
+    Returns the number of events handled.
+    """
+    events = _claim(limit or settings.OUTBOX_BATCH_SIZE, ids)
+    if not events:
+        return 0
+
+    # Opened by the first event with emails and shared by the rest
+    connection = get_connection(fail_silently=False)
+    try:
+        for event in events:
+            _dispatch(event, connection)
+    finally:
+        connection.close()
+
+    return len(events)
+
+
+def _claim(limit, ids):
+    """
+    Count an attempt for the next due events and move them out of reach
+    of other dispatchers until their lease ends.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        events = OutboxEvent.objects.select_for_update(skip_locked=True).filter(
+            status=OutboxEvent.Status.PENDING,
+            next_attempt_at__lte=now
+        )
+        if ids is not None:
+            events = events.filter(pk__in=ids)
+        events = list(events.order_by('next_attempt_at', 'id')[:limit])
+
+        for event in events:
+            event.attempts += 1
+            event.next_attempt_at = now + timedelta(seconds=settings.OUTBOX_LEASE)
+        OutboxEvent.objects.bulk_update(events, ['attempts', 'next_attempt_at'])
+    return events
+
+
+def _dispatch(event, connection):
+    try:
+        messages = _handlers[event.event_type](**event.payload)
+        if messages:
+            connection.open()
+        batch_size = settings.EMAIL_BATCH_SIZE
+        for start in range(0, len(messages), batch_size):
+            connection.send_messages(messages[start:start + batch_size])
+    except Exception as e:
+        logger.exception('Dispatching outbox event %s failed', event.pk)
+        event.last_error = repr(e)
+        if event.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            event.status = OutboxEvent.Status.FAILED
+        else:
+            delay = min(
+                settings.OUTBOX_RETRY_DELAY * 2 ** (event.attempts - 1),
+                settings.OUTBOX_MAX_RETRY_DELAY
+            )
+            event.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+    else:
+        event.status = OutboxEvent.Status.DISPATCHED
+        event.dispatched_at = timezone.now()
+        event.last_error = ''
+
+    event.save(update_fields=['status', 'next_attempt_at', 'last_error', 'dispatched_at'])
+
+
+def purge_events():
+    """
+    Delete events dispatched more than OUTBOX_RETENTION_DAYS ago and
+    events that failed for good more than OUTBOX_FAILED_RETENTION_DAYS
+    ago. Returns the number of events deleted.
+    """
+    now = timezone.now()
+    # A failed event's next_attempt_at is the lease of its last attempt
+    deleted, _ = OutboxEvent.objects.filter(
+        models.Q(
+            status=OutboxEvent.Status.DISPATCHED,
+            dispatched_at__lt=now - timedelta(days=settings.OUTBOX_RETENTION_DAYS)
+        ) |
+        models.Q(
+            status=OutboxEvent.Status.FAILED,
+            next_attempt_at__lt=now - timedelta(days=settings.OUTBOX_FAILED_RETENTION_DAYS)
+        )
+    ).delete()
+    return deleted
+
+
+def _put(event_id):
+    _start_worker()
+    _queue.put(event_id)
+
+
+def _start_worker():
+    global _worker
+    if _worker is None:
+        with _worker_lock:
+            if _worker is None:
+                _worker = threading.Thread(target=_run, name='outbox-dispatcher', daemon=True)
+                _worker.start()
+
+
+def _run():
+    while True:
+        # Wait for one event, then take whatever else is already queued
+        ids = [_queue.get()]
+        while len(ids) < settings.OUTBOX_BATCH_SIZE:
+            try:
+                ids.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+
+        try:
+            close_old_connections()
+            dispatch_pending(len(ids), ids=ids)
+        except Exception:
+            # Left pending for the dispatch_outbox worker
+            logger.exception('Dispatching %d outbox events failed', len(ids))
+        finally:
+            close_old_connections()
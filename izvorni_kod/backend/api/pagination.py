@@ -0,0 +1,43 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class RecordCursorPagination(CursorPagination):
+    """
+    Keyset pagination for record lists.
+    The opaque cursor encodes the position of the last returned row, so every
+    page is a single indexed range scan no matter how deep the client pages.
+    """
+    page_size = 24
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = 'id'
+
+
+class RecordSearchPagination(PageNumberPagination):
+    """
+    Page number pagination for search results, which are ordered by
+    relevance rather than by a unique key.
+    """
+    page_size = 24
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class LocationCursorPagination(CursorPagination):
+    """
+    Keyset pagination for location lists, with larger pages for map views.
+    """
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = 'id'
+
+
+class WishlistCursorPagination(CursorPagination):
+    """
+    Keyset pagination for the wishlist, in the order entries were added.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = 'id'
@@ -0,0 +1,104 @@
+import threading
+import time
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .models import RateLimitBucket
+
+
+class RateLimitTimeout(Exception):
+    """
+    Raised when the next free slot of a bucket is further away than the
+    caller is willing to wait.
+    """
+
+
+# Takes a token, refilling the bucket for the time since its last update
+# first. Tokens may go negative: each caller reserves the next free slot,
+# so concurrent callers queue up in order instead of retrying. Reservations
+# that would wait longer than the timeout are not made and return no row.
+_ACQUIRE_SQL = """
+    INSERT INTO {table} (name, tokens, updated_at)
+    VALUES (%(name)s, %(capacity)s - 1, clock_timestamp())
+    ON CONFLICT (name) DO UPDATE SET
+        tokens = {refilled} - 1,
+        updated_at = clock_timestamp()
+    WHERE {refilled} - 1 >= -%(max_queued)s
+    RETURNING tokens
+"""
+
+_REFILLED_SQL = (
+    'LEAST(%(capacity)s, {table}.tokens + '
+    'EXTRACT(EPOCH FROM clock_timestamp() - {table}.updated_at)::float8 * %(rate)s)'
+)
+
+_connections = threading.local()
+
+
+def _connection():
+    """
+    A database connection of this thread reserved for the limiter. Bucket
+    updates commit on their own, so a caller's open transaction never
+    holds the bucket row lock while it waits or makes its request.
+    """
+    connection = getattr(_connections, 'connection', None)
+    if connection is None:
+        connection = connections.create_connection(DEFAULT_DB_ALIAS)
+        _connections.connection = connection
+    else:
+        connection.close_if_unusable_or_obsolete()
+    return connection
+
+
+def close_connection():
+    """
+    Close this thread's limiter connection, if it has one.
+    """
+    connection = getattr(_connections, 'connection', None)
+    if connection is not None:
+        connection.close()
+        del _connections.connection
+
+
+class TokenBucket:
+    """
+    Rate limit of `rate` operations per second with bursts of up to
+    `capacity`, shared by every process using the same database.
+    """
+
+    def __init__(self, name, rate, capacity=1, timeout=30):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self.timeout = timeout
+
+    def acquire(self, timeout=None):
+        """
+        Reserve the next free slot and sleep until it comes, which is at
+        once if a token is available. Raises RateLimitTimeout, without
+        reserving anything, if the slot is more than `timeout` seconds away.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        table = connections[DEFAULT_DB_ALIAS].ops.quote_name(RateLimitBucket._meta.db_table)
+        sql = _ACQUIRE_SQL.format(
+            table=table,
+            refilled=_REFILLED_SQL.format(table=table)
+        )
+
+        with _connection().cursor() as cursor:
+            cursor.execute(sql, {
+                'name': self.name,
+                'capacity': float(self.capacity),
+                'rate': float(self.rate),
+                'max_queued': float(timeout * self.rate),
+            })
+            row = cursor.fetchone()
+
+        if row is None:
+            raise RateLimitTimeout(
+                f"No '{self.name}' slot available within {timeout} seconds."
+            )
+
+        wait = -row[0] / self.rate
+        if wait > 0:
+            time.sleep(wait)
@@ -1,12 +1,63 @@
-import time
+import csv
+import hashlib
+import io
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
 from django.contrib.gis.geos import Point
-from django.db import transaction
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import prefetch_related_objects
 from rest_framework import serializers
+from rest_framework.fields import SkipField
+from .counters import adjust_counters, get_counts
+from .geocoding import try_reverse_geocode
+from .matching import match_wishlists
 from .models import *
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+
+
+class DynamicFieldsMixin:
+    """
+    Lets GET requests choose the rendered fields with `?fields=a,b` or drop
+    them with `?omit=a,b`. Only the top-level serializer created by the view
+    (the one given the request in its context) is affected.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        selected = self.requested_fields(self.context.get('request'))
+        if selected is None:
+            return
+
+        for name in list(self.fields):
+            if name not in selected and not self.fields[name].write_only:
+                self.fields.pop(name)
+
+    @classmethod
+    def requested_fields(cls, request):
+        """
+        Names of the fields to render for the request, or None for all.
+        Views pass the result to the queryset loading plan so relations of
+        fields that are not rendered are not loaded either.
+        """
+        if request is None or request.method != 'GET':
+            return None
+
+        fields = cls._split_param(request.query_params.get('fields'))
+        omit = cls._split_param(request.query_params.get('omit'))
+        if not fields and not omit:
+            return None
+
+        names = set(cls.Meta.fields)
+        if fields:
+            names &= fields
+        return names - omit
+
+    @staticmethod
+    def _split_param(value):
+        if not value:
+            return set()
+        return {name.strip() for name in value.split(',') if name.strip()}
 
 
 class RegisterSerializer(serializers.ModelSerializer):
@@ -127,44 +178,47 @@ class PhotoSerializer(serializers.ModelSerializer):
 class LocationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Location
-        fields = ('id', 'address', 'city', 'country', 'coordinates')
-        read_only_fields = ('id', 'address', 'city', 'country')
+        fields = ('id', 'address', 'city', 'country', 'coordinates', 'geocoding_status')
+        read_only_fields = ('id', 'address', 'city', 'country', 'geocoding_status')
 
     def create(self, validated_data):
         """
-        Create a location with reverse geocoding.
+        Return the location in the grid cell of the coordinates, creating it
+        if there is none yet. The address of a new location is filled in
+        when it is cached or the geocoder is local; otherwise the location is
+        stored as pending and resolved later by the geocode_locations worker,
+        so the request never waits for a remote geocoding service.
         """
 
         coordinates = validated_data.get('coordinates')
         if not coordinates:
             raise serializers.ValidationError({"message": "Coordinates are required to create a location."})
 
-        try:
-            # Rate limiting (1 request per second)
-            time.sleep(1)   # Pause for 1 second between requests to comply with OpenStreetMap API limits
+        point = Point(
+                coordinates['longitude'], 
+                coordinates['latitude'], 
+                srid=4326
+            )
+        grid_key = Location.grid_key_for(point)
 
-            geolocator = Nominatim(user_agent="location_serializer")
-            location = geolocator.reverse((coordinates['latitude'], coordinates['longitude']), exactly_one=True)
-            address_data = location.raw['address'] if location else {}
+        location = Location.objects.filter(grid_key=grid_key).first()
+        if location is not None:
+            return location
 
-            validated_data['coordinates'] = Point(
-                    coordinates['longitude'], 
-                    coordinates['latitude'], 
-                    srid=4326
-                )
-            validated_data['address'] = location.address if location else 'Unknown Address'
-            validated_data['city'] = address_data.get('city', 'Unknown City')
-            validated_data['country'] = address_data.get('country', 'Unknown Country')
-
-        except (GeocoderTimedOut, GeocoderServiceError) as e:
-            raise serializers.ValidationError({
-                'message': f"Failed to fetch location details: {str(e)}"
-            })
+        validated_data['coordinates'] = point
+        address_data = try_reverse_geocode(coordinates['latitude'], coordinates['longitude'])
+        if address_data is not None:
+            validated_data.update(address_data)
+            validated_data['geocoding_status'] = Location.GeocodingStatus.RESOLVED
+        else:
+            validated_data['geocoding_status'] = Location.GeocodingStatus.PENDING
 
-        return super().create(validated_data)
+        # Another request may have created the cell's location meanwhile
+        location, _ = Location.objects.get_or_create(grid_key=grid_key, defaults=validated_data)
+        return location
 
 
-class RecordSerializer(serializers.ModelSerializer):
+class RecordSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     genre = GenreSerializer(read_only=True)
     genre_id = serializers.PrimaryKeyRelatedField(
         queryset=Genre.objects.all(),
@@ -198,6 +252,11 @@ class RecordSerializer(serializers.ModelSerializer):
     location = LocationSerializer(read_only=True)
     location_add = serializers.JSONField(write_only=True)
 
+    # Copies of the catalog number and wishlist entries for it, read from
+    # the annotations of RecordQuerySet.with_catalog_counts()
+    record_count = serializers.SerializerMethodField()
+    wishlist_count = serializers.SerializerMethodField()
+
     class Meta:
         model = Record
         fields = (
@@ -218,7 +277,9 @@ class RecordSerializer(serializers.ModelSerializer):
             'cover_condition_id',   # For creating via ID
             'user',
             'photos',
-            'add_photos'   # Photos uploaded when adding new record
+            'add_photos',   # Photos uploaded when adding new record
+            'record_count',
+            'wishlist_count'
         )
         read_only_fields = (
             'id',
@@ -230,6 +291,77 @@ class RecordSerializer(serializers.ModelSerializer):
             'location'
         )
 
+    # Fields that depend on other tables' state (e.g. active exchanges) are
+    # rendered on every call and never stored in the fragment cache.
+    uncached_fields = ('available_for_exchange', 'record_count', 'wishlist_count')
+
+    def get_record_count(self, obj):
+        return self._get_catalog_counts(obj)[0]
+
+    def get_wishlist_count(self, obj):
+        return self._get_catalog_counts(obj)[1]
+
+    @staticmethod
+    def _get_catalog_counts(obj):
+        """
+        Counts of the record's catalog number, looked up once for records
+        not loaded through RecordQuerySet.for_serialization().
+        """
+        if not hasattr(obj, 'catalog_wishlist_count'):
+            obj.catalog_record_count, obj.catalog_wishlist_count = get_counts(obj.catalog_number)
+        return obj.catalog_record_count, obj.catalog_wishlist_count
+
+    def to_representation(self, instance):
+        """
+        Render the record, reusing the cached fragment of its current version.
+        Fragments are keyed by `updated_at`, which saving the record, its
+        photos or its location moves forward (see api.signals).
+        """
+        key = self._get_fragment_key(instance)
+        if key is None:
+            return super().to_representation(instance)
+
+        cache = caches['records']
+        fragment = cache.get(key)
+        if fragment is None:
+            data = super().to_representation(instance)
+            cache.set(key, {
+                name: value for name, value in data.items()
+                if name not in self.uncached_fields
+            })
+            return data
+
+        data = {}
+        for field in self._readable_fields:
+            if field.field_name in self.uncached_fields:
+                try:
+                    attribute = field.get_attribute(instance)
+                except SkipField:
+                    continue
+                data[field.field_name] = (
+                    None if attribute is None else field.to_representation(attribute)
+                )
+            elif field.field_name in fragment:
+                data[field.field_name] = fragment[field.field_name]
+        return data
+
+    def _get_fragment_key(self, instance):
+        updated_at = getattr(instance, 'updated_at', None)
+        if instance.pk is None or updated_at is None:
+            return None
+
+        # Fragments differ by the rendered fields and, through absolute
+        # photo URLs, by the host of the request.
+        if not hasattr(self, '_fragment_variant'):
+            request = self.context.get('request')
+            base_url = request.build_absolute_uri('/') if request else ''
+            field_names = ','.join(field.field_name for field in self._readable_fields)
+            self._fragment_variant = hashlib.md5(
+                f'{base_url}|{field_names}'.encode()
+            ).hexdigest()
+
+        return f'record:{instance.pk}:{updated_at.timestamp()}:{self._fragment_variant}'
+
     def validate(self, data):
         user = self.context.get('user')
         if not user:
@@ -307,7 +439,29 @@ class RecordSerializer(serializers.ModelSerializer):
         return instance
 
 
-class WishlistSerializer(serializers.ModelSerializer):
+class RecordSearchSerializer(RecordSerializer):
+    rank = serializers.FloatField(read_only=True)
+    headline = serializers.CharField(read_only=True)
+
+    uncached_fields = RecordSerializer.uncached_fields + ('rank', 'headline')
+
+    class Meta(RecordSerializer.Meta):
+        fields = RecordSerializer.Meta.fields + ('rank', 'headline')
+
+
+class RecordNearbySerializer(RecordSerializer):
+    distance_km = serializers.SerializerMethodField()
+
+    uncached_fields = RecordSerializer.uncached_fields + ('distance_km',)
+
+    class Meta(RecordSerializer.Meta):
+        fields = RecordSerializer.Meta.fields + ('distance_km',)
+
+    def get_distance_km(self, obj):
+        return round(obj.distance.km, 2)
+
+
+class WishlistSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     matching_records = serializers.SerializerMethodField()
 
     class Meta:
@@ -317,10 +471,11 @@ class WishlistSerializer(serializers.ModelSerializer):
 
     def get_matching_records(self, obj):
         """
-        Fetch records with the same catalog_number as the wishlist entry.
+        Records whose normalized catalog number matches the
+        wishlist entry. List views prefetch them for all entries at once.
         """
-        records = Record.objects.filter(catalog_number=obj.record_catalog_number)
-        return RecordSerializer(records, many=True).data
+        prefetch_related_objects([obj], WishlistQuerySet.matched_records_prefetch())
+        return RecordSerializer(obj.matched_records.all(), many=True).data
 
     def validate(self, data):
         user = self.context.get('user')
@@ -330,7 +485,7 @@ class WishlistSerializer(serializers.ModelSerializer):
             })
         
         if Wishlist.objects.filter(
-            record_catalog_number=data['record_catalog_number'],
+            catalog_key=normalize_catalog_number(data['record_catalog_number']),
             user=user
         ).exists():
             raise serializers.ValidationError(
@@ -344,8 +499,108 @@ class WishlistSerializer(serializers.ModelSerializer):
         Ensure the user is set before creating the object.
         """
         validated_data['user'] = self.context.get('user')
-        return super().create(validated_data)
- 
+        try:
+            # A concurrent request may add the same entry after validate()
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError:
+            raise serializers.ValidationError(
+                {"message": "This record catalog number is already added to the user's wishlist."}
+            )
+
+
+class WishlistImportSerializer(serializers.Serializer):
+    """
+    Adds many catalog numbers to a user's wishlist at once, given either as
+    a list or as an uploaded CSV file with one catalog number per row (the
+    first column; a "record_catalog_number" header row is skipped).
+    """
+    MAX_ITEMS = 10000
+
+    catalog_numbers = serializers.ListField(
+        child=serializers.CharField(allow_blank=True),
+        required=False
+    )
+    file = serializers.FileField(required=False, write_only=True)
+
+    def validate(self, data):
+        if not self.context.get('user'):
+            raise serializers.ValidationError({
+                'message': "User must be provided when initializing the serializer."
+            })
+
+        if 'file' in data:
+            catalog_numbers = self._read_csv(data.pop('file'))
+        elif 'catalog_numbers' in data:
+            catalog_numbers = data['catalog_numbers']
+        else:
+            raise serializers.ValidationError({
+                'message': "Provide a list of catalog numbers or a CSV file."
+            })
+
+        if len(catalog_numbers) > self.MAX_ITEMS:
+            raise serializers.ValidationError({
+                'message': f"At most {self.MAX_ITEMS} catalog numbers can be imported at once."
+            })
+
+        max_length = Wishlist._meta.get_field('record_catalog_number').max_length
+        if any(len(number) > max_length for number in catalog_numbers):
+            raise serializers.ValidationError({
+                'message': f"Catalog numbers can be at most {max_length} characters long."
+            })
+
+        data['catalog_numbers'] = catalog_numbers
+        return data
+
+    @staticmethod
+    def _read_csv(upload):
+        try:
+            rows = list(csv.reader(io.TextIOWrapper(upload, encoding='utf-8-sig')))
+        except (UnicodeDecodeError, csv.Error):
+            raise serializers.ValidationError({
+                'message': "The file must be a UTF-8 encoded CSV file."
+            })
+
+        catalog_numbers = [row[0].strip() for row in rows if row]
+        if catalog_numbers and catalog_numbers[0].lower() == 'record_catalog_number':
+            catalog_numbers.pop(0)
+        return catalog_numbers
+
+    def create(self, validated_data):
+        """
+        Insert the catalog numbers the user does not have yet with a single
+        bulk insert, match the new entries against existing records and
+        count them in the catalog counters.
+        Duplicates within the import, also after normalization, are dropped
+        in memory; blank ones are skipped. Returns the inserted and skipped
+        counts.
+        """
+        user = self.context.get('user')
+        catalog_numbers = validated_data['catalog_numbers']
+
+        entries = {}
+        for number in catalog_numbers:
+            number = number.strip()
+            key = normalize_catalog_number(number)
+            if key:
+                entries.setdefault(key, number)
+
+        with transaction.atomic():
+            # Entries the user already has, also ones added concurrently,
+            # conflict on unique_catalog_key_per_user and are skipped
+            inserted = Wishlist.objects.insert_missing(user, entries)
+            # Post-save signals do not run for these inserts
+            match_wishlists(inserted)
+            adjust_counters(wishlists={entry.catalog_key: 1 for entry in inserted})
+
+        return {
+            'inserted': len(inserted),
+            'skipped': len(catalog_numbers) - len(inserted),
+        }
+
+    def to_representation(self, instance):
+        return instance
+
 
 class ExchangeOfferedRecordSerializer(serializers.ModelSerializer):
     record_id = serializers.PrimaryKeyRelatedField(
@@ -375,7 +630,7 @@ class ExchangeRecordRequestedByReceiverSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'record')
 
 
-class ExchangeSerializer(serializers.ModelSerializer):
+class ExchangeSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     initiator_user = UserSerializer(read_only=True)
     receiver_user = UserSerializer(read_only=True)
     next_user_to_review = UserSerializer(read_only=True)
@@ -412,7 +667,7 @@ class ExchangeCreateSerializer(serializers.ModelSerializer):
 
     requested_record = RecordSerializer(read_only=True)
     requested_record_id = serializers.PrimaryKeyRelatedField(
-        queryset=Record.objects.all(),
+        queryset=Record.objects.with_availability(),
         source='requested_record',
         required=True,
         write_only=True,
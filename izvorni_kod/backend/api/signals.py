@@ -1,46 +1,166 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage
 from django.conf import settings
-from .models import Record, Wishlist, Exchange
+from django.utils import timezone
+from . import outbox
+from .conditional import RECORDS_MARKER, bump_marker
+from .counters import adjust_counters
+from .matching import match_record, match_wishlists
+from .models import Record, Wishlist, WishlistMatch, Exchange, ExchangeOfferedRecord, Location, Photo
 
 @receiver(post_save, sender=Exchange)
 def notify_users_on_new_exchange(sender, instance, created, **kwargs):
     if created:
-        initiator = instance.initiator_user
-        receiver = instance.receiver_user
-
-        subject = f"New Exchange Offer from {initiator.username}!"
-        message = (
-            f"Hi {receiver.first_name},\n\n"
-            f"User {initiator.username} has proposed a new exchange offer. "
-            f"Check the details of the exchange here: {settings.SITE_URL}/exchanges/{instance.id}/\n\n"
-            f"Best regards,\nThe Record Exchange Team"
-        )
-        
-        send_mail(
-            subject=subject,
-            message=message,
+        outbox.publish('exchange_created', exchange_id=instance.id)
+
+
+@outbox.handler('exchange_created')
+def exchange_created_emails(exchange_id):
+    exchange = Exchange.objects.select_related(
+        'initiator_user', 'receiver_user'
+    ).filter(id=exchange_id).first()
+    if exchange is None:
+        return []
+
+    initiator = exchange.initiator_user
+    receiver = exchange.receiver_user
+
+    subject = f"New Exchange Offer from {initiator.username}!"
+    message = (
+        f"Hi {receiver.first_name},\n\n"
+        f"User {initiator.username} has proposed a new exchange offer. "
+        f"Check the details of the exchange here: {settings.SITE_URL}/exchanges/{exchange.id}/\n\n"
+        f"Best regards,\nThe Record Exchange Team"
+    )
+
+    return [EmailMessage(
+        subject=subject,
+        body=message,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[receiver.email],
+    )]
+
+
+@receiver(post_save, sender=Record)
+def update_wishlist_matches_on_record_save(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Recompute the record's wishlist matches when it is created or its
+    catalog number may have changed. Deleted records lose their matches by
+    cascade.
+    """
+    if created or update_fields is None or {'catalog_number', 'catalog_key'} & set(update_fields):
+        match_record(instance)
+
+
+@receiver(post_save, sender=Wishlist)
+def update_wishlist_matches_on_wishlist_save(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Recompute the matches of a new or changed wishlist entry.
+    """
+    if created or update_fields is None or {'record_catalog_number', 'catalog_key'} & set(update_fields):
+        match_wishlists([instance])
+
+
+@receiver(post_save, sender=Record)
+@receiver(post_save, sender=Wishlist)
+def update_catalog_counters_on_save(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Count a new record or wishlist entry under its catalog key, or move it
+    to the new key when its catalog number changed.
+    """
+    deltas = {}
+    if created:
+        deltas = {instance.catalog_key: 1}
+    elif update_fields is None or 'catalog_key' in update_fields:
+        previous = getattr(instance, '_previous_catalog_key', None)
+        if previous is not None and previous != instance.catalog_key:
+            deltas = {previous: -1, instance.catalog_key: 1}
+
+    if deltas:
+        _adjust_catalog_counters(sender, deltas)
+
+
+@receiver(post_delete, sender=Record)
+@receiver(post_delete, sender=Wishlist)
+def update_catalog_counters_on_delete(sender, instance, **kwargs):
+    _adjust_catalog_counters(sender, {instance.catalog_key: -1})
+
+
+def _adjust_catalog_counters(sender, deltas):
+    if sender is Record:
+        adjust_counters(records=deltas)
+    else:
+        adjust_counters(wishlists=deltas)
+
+
+@receiver(post_save, sender=Record)
+def notify_wishlist_users_on_new_record(sender, instance, created, **kwargs):
+    # The matches were just computed by update_wishlist_matches_on_record_save
+    if created and WishlistMatch.objects.filter(record=instance).exists():
+        outbox.publish('record_created', record_id=instance.id)
+
+
+@outbox.handler('record_created')
+def record_created_emails(record_id):
+    record = Record.objects.filter(id=record_id).first()
+    if record is None:
+        return []
+
+    # Wishlist entries matched by the new record, with
+    # their users loaded in the same query
+    wishlist_entries = Wishlist.objects.filter(matches__record=record).select_related('user')
+
+    return [
+        EmailMessage(
+            subject='Record from Your Wishlist is available!',
+            body=(
+                f'Hello {entry.user.first_name},\
+                \nThe record with catalog number "{record.catalog_number}" ({record.artist} - {record.album_name}) from your wishlist has just been added to the system!\
+                \nYou can check it out here: {settings.SITE_URL}/records/{record.id}/'
+            ),
             from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[receiver.email],
-            fail_silently=False,
+            to=[entry.user.email],
         )
+        for entry in wishlist_entries
+    ]
+
+
+@receiver(post_save, sender=Photo)
+@receiver(post_delete, sender=Photo)
+def touch_record_on_photo_change(sender, instance, **kwargs):
+    """
+    Move the record's version forward so cached fragments and ETags of
+    the record are invalidated.
+    """
+    Record.objects.filter(pk=instance.record_id).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Location)
+@receiver(pre_delete, sender=Location)
+def touch_records_on_location_change(sender, instance, **kwargs):
+    """
+    Move the version of every record at the location forward so cached
+    fragments and ETags of those records are invalidated.
+    """
+    Record.objects.filter(location=instance).update(updated_at=timezone.now())
+
 
 @receiver(post_save, sender=Record)
-def notify_wishlist_users_on_new_record(sender, instance, created, **kwargs):
-    if created:
-        # Find all wishlist entries that match the catalog_number of the new record
-        wishlist_entries = Wishlist.objects.filter(record_catalog_number=instance.catalog_number)
-        
-        for entry in wishlist_entries:
-            send_mail(
-                subject='Record from Your Wishlist is available!',
-                message=(
-                    f'Hello {entry.user.first_name},\
-                    \nThe record with catalog number "{instance.catalog_number}" ({instance.artist} - {instance.album_name}) from your wishlist has just been added to the system!\
-                    \nYou can check it out here: {settings.SITE_URL}/records/{instance.id}/'
-                ),
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[entry.user.email],
-                fail_silently=False,
-            )
+@receiver(post_delete, sender=Record)
+@receiver(post_save, sender=Photo)
+@receiver(post_delete, sender=Photo)
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+@receiver(post_save, sender=Exchange)
+@receiver(post_delete, sender=Exchange)
+@receiver(post_save, sender=ExchangeOfferedRecord)
+@receiver(post_delete, sender=ExchangeOfferedRecord)
+def bump_records_marker(sender, **kwargs):
+    """
+    Move the records marker forward for every change that shows in record
+    payloads, invalidating the ETags of record lists and details.
+    Offered records added with bulk_create are covered by the save of
+    their exchange in the same transaction.
+    """
+    bump_marker(RECORDS_MARKER)
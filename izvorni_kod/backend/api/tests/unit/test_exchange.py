@@ -2,7 +2,9 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.gis.geos import Point
+from django.core import mail
 from api.models import *
+from api.outbox import dispatch_pending
 
 
 class ExchangeCreationTests(APITestCase):
@@ -126,6 +128,27 @@ class ExchangeCreationTests(APITestCase):
         expected_ids = {self.offered_record1.id, self.offered_record2.id}
         self.assertEqual(offered_record_ids, expected_ids)
 
+    def test_create_exchange_notifies_receiver_through_outbox(self):
+        """
+        Test that creating an exchange writes an outbox event, which the
+        dispatcher turns into an email to the receiver
+        """
+        # Leave out the events of the records created in setUp
+        OutboxEvent.objects.all().delete()
+        self.client.force_authenticate(user=self.initiator_user)
+        response = self.client.post(self.create_url, self.valid_payload, format='json')
+
+        event = OutboxEvent.objects.get(event_type='exchange_created')
+        self.assertEqual(event.payload, {'exchange_id': response.data['id']})
+        self.assertEqual(len(mail.outbox), 0)
+
+        self.assertEqual(dispatch_pending(), 1)
+
+        event.refresh_from_db()
+        self.assertEqual(event.status, OutboxEvent.Status.DISPATCHED)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['receiver@example.com'])
+
     def test_create_exchange_no_authentication(self):
         """
         Test exchange creation without authentication
@@ -500,6 +523,41 @@ class ExchangeUpdateTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
 
+    def test_retrieve_exchange_conditional_requires_participant(self):
+        """
+        Test that a non-participant sending conditional headers is denied
+        instead of getting 304, and a missing exchange is 404
+        """
+        detail_url = reverse('api:exchange-detail', args=[self.exchange.id])
+        self.client.force_authenticate(user=self.receiver_user)
+        response = self.client.get(detail_url)
+        etag = response['ETag']
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        other_user = User.objects.create_user(
+            email='other@example.com',
+            username='other',
+            password='OtherPass123!'
+        )
+        self.client.force_authenticate(user=other_user)
+        response = self.client.get(
+            detail_url,
+            HTTP_IF_NONE_MATCH=etag,
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertNotIn('Last-Modified', response)
+
+        response = self.client.get(
+            reverse('api:exchange-detail', args=[self.exchange.id + 1000]),
+            HTTP_IF_NONE_MATCH='*'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
 class ExchangeSwitchReviewerTests(APITestCase):
     def setUp(self):
         """
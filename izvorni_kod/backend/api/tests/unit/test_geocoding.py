@@ -0,0 +1,187 @@
+import math
+import os
+import random
+import tempfile
+from unittest import mock
+from django.contrib.gis.geos import Point
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from geopy.exc import GeocoderServiceError
+from api import geohash
+from api.geocoders import GazetteerGeocoder, KDTree, _unit_vector
+from api.geocoding import _claim_pending_location, geocode_pending_locations
+from api.models import Location
+from api.ratelimit import RateLimitTimeout, TokenBucket, close_connection
+
+
+GAZETTEER_ROWS = [
+    # geonameid, name, asciiname, alternatenames, latitude, longitude,
+    # feature class, feature code, country code, cc2, admin1-4, population
+    ('3186886', 'Zagreb', 'Zagreb', '', '45.81444', '15.97798', 'P', 'PPLC', 'HR', '', '', '', '', '', '698966'),
+    ('3190261', 'Split', 'Split', '', '43.50891', '16.43915', 'P', 'PPLA', 'HR', '', '', '', '', '', '160577'),
+    ('2643743', 'London', 'London', '', '51.50853', '-0.12574', 'P', 'PPLC', 'GB', '', '', '', '', '', '8961989'),
+    ('6058560', 'London', 'London', '', '42.98339', '-81.23304', 'P', 'PPLA2', 'CA', '', '', '', '', '', '346765'),
+    ('2193733', 'Auckland', 'Auckland', '', '-36.84853', '174.76349', 'P', 'PPLA', 'NZ', '', '', '', '', '', '417910'),
+    ('4032402', 'Apia', 'Apia', '', '-13.83333', '-171.76666', 'P', 'PPLC', 'WS', '', '', '', '', '', '40407'),
+]
+
+COUNTRY_ROWS = [
+    ('#ISO', 'ISO3', 'ISO-Numeric', 'fips', 'Country'),
+    ('HR', 'HRV', '191', 'HR', 'Croatia'),
+    ('GB', 'GBR', '826', 'UK', 'United Kingdom'),
+]
+
+
+class GazetteerGeocoderTests(SimpleTestCase):
+    def setUp(self):
+        """
+        Writes a tiny GeoNames-style gazetteer and country file.
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        gazetteer_path = os.path.join(self.directory.name, 'cities.txt')
+        country_info_path = os.path.join(self.directory.name, 'countryInfo.txt')
+
+        with open(gazetteer_path, 'w', encoding='utf-8') as gazetteer:
+            gazetteer.writelines('\t'.join(row) + '\n' for row in GAZETTEER_ROWS)
+        with open(country_info_path, 'w', encoding='utf-8') as country_info:
+            country_info.writelines('\t'.join(row) + '\n' for row in COUNTRY_ROWS)
+
+        self.geocoder = GazetteerGeocoder(gazetteer_path, country_info_path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_reverse_nearest_city(self):
+        """
+        Test that coordinates resolve to the nearest city and its country name
+        """
+        result = self.geocoder.reverse(45.80, 15.95)
+
+        self.assertEqual(result['city'], 'Zagreb')
+        self.assertEqual(result['country'], 'Croatia')
+        self.assertEqual(result['address'], 'Zagreb, Croatia')
+
+    def test_reverse_across_dateline(self):
+        """
+        Test that the nearest city is found across the antimeridian and that
+        unknown country codes are returned as is
+        """
+        result = self.geocoder.reverse(-14.0, 179.9)
+
+        self.assertEqual(result['city'], 'Apia')
+        self.assertEqual(result['country'], 'WS')
+
+    def test_geocode_most_populous(self):
+        """
+        Test that forward lookups pick the most populous city of that name
+        """
+        latitude, longitude, address = self.geocoder.geocode('London, UK')
+
+        self.assertAlmostEqual(latitude, 51.50853)
+        self.assertAlmostEqual(longitude, -0.12574)
+        self.assertEqual(address, 'London, United Kingdom')
+        self.assertIsNone(self.geocoder.geocode('Atlantis, Nowhere'))
+
+
+class KDTreeTests(SimpleTestCase):
+    def test_nearest_matches_brute_force(self):
+        """
+        Test the tree against a linear scan on random points
+        """
+        rng = random.Random(7)
+        points = [
+            _unit_vector(rng.uniform(-90, 90), rng.uniform(-180, 180))
+            for _ in range(500)
+        ]
+        tree = KDTree(points)
+
+        for _ in range(200):
+            query = _unit_vector(rng.uniform(-90, 90), rng.uniform(-180, 180))
+            expected = min(range(len(points)), key=lambda i: math.dist(points[i], query))
+            self.assertEqual(tree.nearest(query), expected)
+
+    def test_empty_tree(self):
+        """
+        Test that an empty tree has no nearest point
+        """
+        self.assertIsNone(KDTree([]).nearest((1.0, 0.0, 0.0)))
+
+
+class GeohashTests(SimpleTestCase):
+    def test_encode(self):
+        """
+        Test encoding against a reference geohash and that nearby points
+        share a cell prefix
+        """
+        self.assertEqual(geohash.encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(geohash.encode(45.8150, 15.9819, 8), geohash.encode(45.81502, 15.98191, 8))
+        self.assertNotEqual(geohash.encode(45.8150, 15.9819, 8), geohash.encode(43.5081, 16.4402, 8))
+
+
+class TokenBucketTests(TestCase):
+    def tearDown(self):
+        # The limiter keeps its own connection, which would otherwise block
+        # dropping the test database
+        close_connection()
+
+    def test_acquire_within_rate(self):
+        """
+        Test that tokens are handed out while the bucket has them
+        """
+        bucket = TokenBucket('test-fast', rate=1000, capacity=2)
+
+        for _ in range(5):
+            bucket.acquire(timeout=1)
+
+    def test_acquire_timeout(self):
+        """
+        Test that a caller whose slot is beyond the timeout is refused
+        """
+        bucket = TokenBucket('test-slow', rate=0.01, capacity=1)
+        bucket.acquire(timeout=1)
+
+        with self.assertRaises(RateLimitTimeout):
+            bucket.acquire(timeout=1)
+
+
+class PendingLocationClaimTests(TestCase):
+    def test_claim_leases_location(self):
+        """
+        Test that a claimed location counts the attempt and is skipped by
+        other claims until its lease expires
+        """
+        location = Location.objects.create(
+            coordinates=Point(16.4402, 43.5081),
+            geocoding_status=Location.GeocodingStatus.PENDING
+        )
+
+        claimed = _claim_pending_location()
+
+        self.assertEqual(claimed.pk, location.pk)
+        location.refresh_from_db()
+        self.assertEqual(location.geocoding_attempts, 1)
+        self.assertGreater(location.geocoding_claimed_until, timezone.now())
+        self.assertIsNone(_claim_pending_location())
+
+        Location.objects.filter(pk=location.pk).update(geocoding_claimed_until=timezone.now())
+
+        self.assertEqual(_claim_pending_location().pk, location.pk)
+
+    def test_failed_location_backs_off(self):
+        """
+        Test that a location whose lookup failed stays pending but is not
+        retried in the same run
+        """
+        location = Location.objects.create(
+            coordinates=Point(16.4402, 43.5081),
+            geocoding_status=Location.GeocodingStatus.PENDING
+        )
+
+        with mock.patch('api.geocoding.reverse_geocode', side_effect=GeocoderServiceError('down')):
+            self.assertEqual(geocode_pending_locations(5), 1)
+
+        location.refresh_from_db()
+        self.assertEqual(location.geocoding_status, Location.GeocodingStatus.PENDING)
+        self.assertEqual(location.geocoding_attempts, 1)
+        self.assertGreater(location.geocoding_claimed_until, timezone.now())
+        self.assertIsNone(_claim_pending_location())
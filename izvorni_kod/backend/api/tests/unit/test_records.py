@@ -2,6 +2,10 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.gis.geos import Point
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from api.geocoding import cache_key, reset_cache
 from api.models import *
 
 
@@ -28,6 +32,15 @@ class RecordViewTests(APITestCase):
             last_name='User'
         )
 
+        self.staff_user = User.objects.create_user(
+            email='admin@example.com',
+            username='adminuser',
+            password='AdminPass123!',
+            first_name='Admin',
+            last_name='User',
+            is_staff=True
+        )
+
         # Create test genre
         self.genre = Genre.objects.create(name='Rock')
 
@@ -122,8 +135,52 @@ class RecordViewTests(APITestCase):
         response = self.client.get(self.list_url)
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['catalog_number'], 'TEST001')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['catalog_number'], 'TEST001')
+        self.assertIsNone(response.data['next'])
+
+    def test_get_record_list_cursor_pagination(self):
+        """
+        Test walking the record list page by page using the returned cursors
+        """
+        Record.objects.create(
+            catalog_number='TEST003',
+            artist='Second Artist',
+            album_name='Second Album',
+            release_year=2019,
+            genre=self.genre,
+            location=self.location,
+            record_condition=self.record_condition,
+            cover_condition=self.cover_condition,
+            user=self.another_user
+        )
+
+        response = self.client.get(self.list_url, {'page_size': 1})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['catalog_number'], 'TEST001')
+        self.assertIsNotNone(response.data['next'])
+
+        response = self.client.get(response.data['next'])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['catalog_number'], 'TEST003')
+        self.assertIsNone(response.data['next'])
+        self.assertIsNotNone(response.data['previous'])
+
+    def test_get_user_record_list(self):
+        """
+        Test retrieving the paginated list of a single user's records
+        """
+        url = reverse('api:records-user', args=[self.user.id])
+
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['user']['id'], self.user.id)
 
     def test_get_record_detail(self):
         """
@@ -187,3 +244,446 @@ class RecordViewTests(APITestCase):
         
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
         self.assertEqual(Record.objects.count(), 1)  # Record still exists
+
+    def test_get_record_list_filtered(self):
+        """
+        Test filtering the record list by query parameters
+        """
+        other_genre = Genre.objects.create(name='Jazz')
+        Record.objects.create(
+            catalog_number='JAZZ001',
+            artist='Jazz Artist',
+            album_name='Jazz Album',
+            release_year=1965,
+            genre=other_genre,
+            location=self.location,
+            record_condition=self.record_condition,
+            cover_condition=self.cover_condition,
+            user=self.another_user
+        )
+
+        response = self.client.get(self.list_url, {'genre': other_genre.id, 'release_year': 1965})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['catalog_number'], 'JAZZ001')
+
+        response = self.client.get(self.list_url, {'q': 'test album'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['catalog_number'], 'TEST001')
+
+        # Partial words and catalog numbers match as substrings
+        response = self.client.get(self.list_url, {'q': 'jaz'})
+
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['catalog_number'], 'JAZZ001')
+
+        response = self.client.get(self.list_url, {'q': 'st00'})
+
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['catalog_number'], 'TEST001')
+
+    def test_get_record_list_invalid_filter(self):
+        """
+        Test filtering the record list with a non-integer parameter
+        """
+        response = self.client.get(self.list_url, {'genre': 'rock'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_get_record_list_available_for_exchange(self):
+        """
+        Test that records offered in an active exchange are reported and
+        filtered as unavailable
+        """
+        requested_record = Record.objects.create(
+            catalog_number='TEST004',
+            artist='Requested Artist',
+            album_name='Requested Album',
+            release_year=2018,
+            genre=self.genre,
+            location=self.location,
+            record_condition=self.record_condition,
+            cover_condition=self.cover_condition,
+            user=self.another_user
+        )
+        exchange = Exchange.objects.create(
+            initiator_user=self.user,
+            receiver_user=self.another_user,
+            next_user_to_review=self.another_user,
+            requested_record=requested_record
+        )
+        ExchangeOfferedRecord.objects.create(exchange=exchange, record=self.record)
+
+        response = self.client.get(self.list_url)
+
+        availability = {
+            record['catalog_number']: record['available_for_exchange']
+            for record in response.data['results']
+        }
+        self.assertEqual(availability, {'TEST001': False, 'TEST004': True})
+
+        response = self.client.get(self.list_url, {'available_for_exchange': 'true'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [record['catalog_number'] for record in response.data['results']],
+            ['TEST004']
+        )
+
+    def test_get_record_list_constant_queries(self):
+        """
+        Test that the number of queries for the record list does not grow
+        with the number of records
+        """
+        with CaptureQueriesContext(connection) as single_record_queries:
+            self.client.get(self.list_url)
+
+        for i in range(5):
+            Record.objects.create(
+                catalog_number=f'BULK00{i}',
+                artist='Bulk Artist',
+                album_name='Bulk Album',
+                release_year=2000,
+                genre=self.genre,
+                location=self.location,
+                record_condition=self.record_condition,
+                cover_condition=self.cover_condition,
+                user=self.another_user
+            )
+
+        with CaptureQueriesContext(connection) as many_records_queries:
+            response = self.client.get(self.list_url)
+
+        self.assertEqual(len(response.data['results']), 6)
+        self.assertEqual(len(many_records_queries), len(single_record_queries))
+
+    def test_search_records(self):
+        """
+        Test full-text search ranking and highlighted snippets
+        """
+        Record.objects.create(
+            catalog_number='SEARCH001',
+            artist='Miles Davis',
+            album_name='Kind of Blue',
+            release_year=1959,
+            genre=self.genre,
+            location=self.location,
+            record_condition=self.record_condition,
+            cover_condition=self.cover_condition,
+            user=self.another_user,
+            additional_description='Original pressing of the modal jazz classic.'
+        )
+
+        response = self.client.get(reverse('api:record-search'), {'q': 'jazz'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['catalog_number'], 'SEARCH001')
+        self.assertIn('<mark>jazz</mark>', response.data['results'][0]['headline'])
+        self.assertGreater(response.data['results'][0]['rank'], 0)
+
+    def test_search_records_missing_query(self):
+        """
+        Test full-text search without a query
+        """
+        response = self.client.get(reverse('api:record-search'))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_fuzzy_lookup(self):
+        """
+        Test typo-tolerant lookup of catalog numbers and artists
+        """
+        response = self.client.get(reverse('api:record-lookup'), {'q': 'TEST01'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['catalog_numbers'][0]['catalog_number'], 'TEST001')
+
+        response = self.client.get(reverse('api:record-lookup'), {'q': 'Test Artst'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['artists'][0]['artist'], 'Test Artist')
+
+    def test_fuzzy_lookup_invalid_threshold(self):
+        """
+        Test typo-tolerant lookup with a threshold outside (0, 1]
+        """
+        response = self.client.get(reverse('api:record-lookup'), {'q': 'TEST01', 'threshold': '2'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_get_record_list_sparse_fields(self):
+        """
+        Test selecting and omitting fields of the record list
+        """
+        response = self.client.get(self.list_url, {'fields': 'id,artist'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'artist'})
+
+        response = self.client.get(self.list_url, {'omit': 'photos,location,user'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('photos', response.data['results'][0])
+        self.assertNotIn('location', response.data['results'][0])
+        self.assertNotIn('user', response.data['results'][0])
+        self.assertIn('genre', response.data['results'][0])
+
+    def test_get_record_list_conditional(self):
+        """
+        Test that an unchanged record list is answered with 304 Not Modified
+        and a changed one with a new ETag
+        """
+        response = self.client.get(self.list_url)
+        etag = response['ETag']
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # The records marker moves forward once the change is committed
+        with self.captureOnCommitCallbacks(execute=True):
+            self.record.artist = 'Changed Artist'
+            self.record.save()
+
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_get_record_detail_fragment_invalidation(self):
+        """
+        Test that cached record payloads are refreshed when the location of
+        the record changes
+        """
+        response = self.client.get(self.detail_url)
+
+        self.assertEqual(response.data['location']['city'], 'Test City')
+
+        self.location.city = 'New City'
+        self.location.save()
+
+        response = self.client.get(self.detail_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['location']['city'], 'New City')
+
+    def test_export_records_ndjson(self):
+        """
+        Test that staff users can stream all records as NDJSON
+        """
+        self.client.force_authenticate(user=self.staff_user)
+        response = self.client.get(reverse('api:record-export'))
+        lines = b''.join(response.streaming_content).decode().splitlines()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(len(lines), Record.objects.count())
+        self.assertIn('"catalog_number": "TEST001"', lines[0])
+        self.assertIn('"owner": "testuser"', lines[0])
+
+    def test_export_records_csv(self):
+        """
+        Test CSV export, which starts with a header row
+        """
+        self.client.force_authenticate(user=self.staff_user)
+        response = self.client.get(reverse('api:record-export'), {'type': 'csv'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(lines[0].startswith('id,catalog_number,artist'))
+        self.assertEqual(len(lines), Record.objects.count() + 1)
+        self.assertIn('genre_name', lines[0].split(','))
+        self.assertIn('Rock', lines[1].split(','))
+
+    def test_export_records_forbidden(self):
+        """
+        Test that regular users cannot export records
+        """
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse('api:record-export'))
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_get_nearby_records(self):
+        """
+        Test that records within the radius are returned with their distance
+        """
+        url = reverse('api:record-nearby')
+        response = self.client.get(url, {'lat': 45.81, 'lon': 15.98, 'radius': 5})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['id'], self.record.id)
+        self.assertLess(response.data['results'][0]['distance_km'], 5)
+
+        response = self.client.get(url, {'lat': 43.51, 'lon': 16.44, 'radius': 10})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 0)
+
+    def test_get_nearby_records_invalid_point(self):
+        """
+        Test that missing or out of range coordinates are rejected
+        """
+        url = reverse('api:record-nearby')
+        response = self.client.get(url, {'lon': 15.98})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(url, {'lat': 95, 'lon': 15.98})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_create_record_geocode_cache(self):
+        """
+        Test that locations near cached coordinates are resolved from the
+        geocode cache without calling Nominatim
+        """
+        reset_cache()
+        GeocodeCacheEntry.objects.create(
+            key=cache_key(43.5081, 16.4402),
+            address='Cached Street 1',
+            city='Cached City',
+            country='Cached Country'
+        )
+        self.client.force_authenticate(user=self.user)
+        payload = dict(self.valid_payload)
+        payload['location_add'] = {
+            'coordinates': {'latitude': 43.50814, 'longitude': 16.44018}
+        }
+
+        response = self.client.post(self.create_url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['location']['city'], 'Cached City')
+        self.assertEqual(response.data['location']['geocoding_status'], 'resolved')
+
+        self.client.force_authenticate(user=self.staff_user)
+        response = self.client.get(reverse('api:geocode-cache-stats'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['db_hits'], 1)
+        self.assertEqual(response.data['misses'], 0)
+
+    def test_create_record_location_pending(self):
+        """
+        Test that uncached locations are stored right away and left pending
+        for the geocoding worker
+        """
+        reset_cache()
+        self.client.force_authenticate(user=self.user)
+        payload = dict(self.valid_payload)
+        payload['location_add'] = {
+            'coordinates': {'latitude': 43.5081, 'longitude': 16.4402}
+        }
+
+        response = self.client.post(self.create_url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['location']['geocoding_status'], 'pending')
+        location = Location.objects.get(id=response.data['location']['id'])
+        self.assertAlmostEqual(location.coordinates.y, 43.5081)
+        self.assertEqual(location.address, '')
+
+    def test_create_record_reuses_location(self):
+        """
+        Test that coordinates in the grid cell of an existing location reuse
+        that location instead of creating a new one
+        """
+        self.client.force_authenticate(user=self.user)
+        payload = dict(self.valid_payload)
+        payload['location_add'] = {
+            'coordinates': {'latitude': 45.81502, 'longitude': 15.98191}
+        }
+
+        response = self.client.post(self.create_url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['location']['id'], self.location.id)
+        self.assertEqual(Location.objects.count(), 1)
+
+    def test_get_record_clusters(self):
+        """
+        Test that records in the viewport are grouped into clusters with
+        their count and centroid
+        """
+        cache.clear()
+        Record.objects.create(
+            catalog_number='TEST003',
+            artist='Second Artist',
+            album_name='Second Album',
+            release_year=2019,
+            genre=self.genre,
+            location=self.location,
+            record_condition=self.record_condition,
+            cover_condition=self.cover_condition,
+            user=self.another_user
+        )
+        url = reverse('api:record-clusters')
+        response = self.client.get(url, {'bbox': '15.5,45.5,16.5,46.0', 'zoom': 10})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['clusters']), 1)
+        self.assertEqual(response.data['clusters'][0]['count'], 2)
+        self.assertAlmostEqual(response.data['clusters'][0]['latitude'], 45.8150)
+
+        response = self.client.get(url, {'bbox': '0,0,1,1', 'zoom': 10})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['clusters'], [])
+
+    def test_get_record_clusters_invalid_bbox(self):
+        """
+        Test that a missing or malformed bounding box is rejected
+        """
+        url = reverse('api:record-clusters')
+        response = self.client.get(url, {'zoom': 10})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(url, {'bbox': '16.5,45.5,15.5,46.0', 'zoom': 10})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_get_record_list_bbox(self):
+        """
+        Test filtering the record list by map viewport
+        """
+        response = self.client.get(self.list_url, {'bbox': '15.5,45.5,16.5,46.0'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+
+        response = self.client.get(self.list_url, {'bbox': '0,0,1,1'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 0)
+
+    def test_get_location_list_bbox(self):
+        """
+        Test that the location list is paginated and filtered by viewport
+        """
+        Location.objects.create(
+            address='Other Street 1',
+            city='Split',
+            country='Croatia',
+            coordinates=Point(16.4402, 43.5081)
+        )
+        self.client.force_authenticate(user=self.user)
+        url = reverse('api:location-list')
+
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 2)
+
+        response = self.client.get(url, {'bbox': '15.5,45.5,16.5,46.0'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['id'], self.location.id)
@@ -1,8 +1,17 @@
+import io
+from datetime import timedelta
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.gis.geos import Point
+from django.db import IntegrityError, connection, transaction
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from api.models import *
+from api.outbox import dispatch_pending
 
 
 class WishlistViewTests(APITestCase):
@@ -70,6 +79,8 @@ class WishlistViewTests(APITestCase):
         # Define URLs
         self.list_url = reverse('api:wishlist-list')
         self.create_url = reverse('api:wishlist-add')
+        self.import_url = reverse('api:wishlist-import')
+        self.counts_url = reverse('api:record-counts')
         self.delete_url = reverse('api:wishlist-delete', args=[self.wishlist_item.id])
 
         # Define valid payload for wishlist creation
@@ -85,11 +96,11 @@ class WishlistViewTests(APITestCase):
         response = self.client.get(self.list_url)
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['record_catalog_number'], 'TEST001')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['record_catalog_number'], 'TEST001')
         # Verify matching records are included
-        self.assertEqual(len(response.data[0]['matching_records']), 1)
-        self.assertEqual(response.data[0]['matching_records'][0]['catalog_number'], 'TEST001')
+        self.assertEqual(len(response.data['results'][0]['matching_records']), 1)
+        self.assertEqual(response.data['results'][0]['matching_records'][0]['catalog_number'], 'TEST001')
 
     def test_get_wishlist_unauthenticated(self):
         """
@@ -124,6 +135,16 @@ class WishlistViewTests(APITestCase):
         self.assertEqual(Wishlist.objects.count(), 1)  # No new item created
         self.assertIn('message', response.data)
 
+    def test_wishlist_catalog_key_unique_per_user(self):
+        """
+        Test that the database rejects another spelling of a catalog number
+        already on the user's wishlist
+        """
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Wishlist.objects.create(user=self.user, record_catalog_number='test-001')
+
+        Wishlist.objects.create(user=self.another_user, record_catalog_number='test-001')
+
     def test_create_wishlist_item_unauthenticated(self):
         """
         Test creating a wishlist item without authentication
@@ -184,7 +205,332 @@ class WishlistViewTests(APITestCase):
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         # Verify both matching records are included
-        self.assertEqual(len(response.data[0]['matching_records']), 2)
+        self.assertEqual(len(response.data['results'][0]['matching_records']), 2)
         # Verify different artists are present
-        artists = {record['artist'] for record in response.data[0]['matching_records']}
+        artists = {record['artist'] for record in response.data['results'][0]['matching_records']}
         self.assertEqual(artists, {'Test Artist', 'Another Artist'})
+
+    def test_get_wishlist_constant_queries(self):
+        """
+        Test that the number of queries for the wishlist does not grow with
+        the number of entries and matching records
+        """
+        self.client.force_authenticate(user=self.user)
+
+        with CaptureQueriesContext(connection) as single_entry_queries:
+            self.client.get(self.list_url)
+
+        for i in range(5):
+            Wishlist.objects.create(user=self.user, record_catalog_number=f'BULK00{i}')
+            Record.objects.create(
+                catalog_number=f'BULK00{i}',
+                artist='Bulk Artist',
+                album_name='Bulk Album',
+                release_year=2000,
+                genre=self.genre,
+                location=self.location,
+                record_condition=self.record_condition,
+                cover_condition=self.cover_condition,
+                user=self.another_user
+            )
+
+        with CaptureQueriesContext(connection) as many_entries_queries:
+            response = self.client.get(self.list_url)
+
+        self.assertEqual(len(response.data['results']), 6)
+        self.assertEqual(len(response.data['results'][5]['matching_records']), 1)
+        self.assertEqual(len(many_entries_queries), len(single_entry_queries))
+
+    def test_matching_records_normalized_catalog_number(self):
+        """
+        Test that catalog numbers differing only in case and separators
+        match, and that such duplicates cannot be added twice
+        """
+        self.client.force_authenticate(user=self.user)
+        Record.objects.create(
+            catalog_number='test 001',
+            artist='Another Artist',
+            album_name='Another Album',
+            release_year=2021,
+            genre=self.genre,
+            location=self.location,
+            record_condition=self.record_condition,
+            cover_condition=self.cover_condition,
+            user=self.another_user
+        )
+
+        response = self.client.get(self.list_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results'][0]['matching_records']), 2)
+
+        response = self.client.post(self.create_url, {'record_catalog_number': 'Test-001'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_matching_records_include_own_records(self):
+        """
+        Test that the user's own records match their wishlist too, also
+        after an ownership change, as they always have
+        """
+        self.client.force_authenticate(user=self.user)
+        self.record.user = self.user
+        self.record.save(update_fields=['user', 'updated_at'])
+
+        response = self.client.get(self.list_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        matching_records = response.data['results'][0]['matching_records']
+        self.assertEqual([record['id'] for record in matching_records], [self.record.id])
+
+    def test_matching_records_removed_with_record(self):
+        """
+        Test that deleting a record removes its wishlist matches
+        """
+        self.record.delete()
+
+        self.assertFalse(WishlistMatch.objects.exists())
+
+    def test_import_wishlist_json(self):
+        """
+        Test importing a JSON list skips existing, duplicate and blank entries
+        and matches the new ones
+        """
+        self.client.force_authenticate(user=self.user)
+        payload = ['test-001', 'NEW-1', 'new 1', 'NEW2', '', 'TEST 001']
+
+        response = self.client.post(self.import_url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data, {'inserted': 2, 'skipped': 4})
+        self.assertEqual(
+            set(Wishlist.objects.filter(user=self.user).values_list('record_catalog_number', flat=True)),
+            {'TEST001', 'NEW-1', 'NEW2'}
+        )
+
+        new_record = Record.objects.get(pk=self.record.pk)
+        new_record.pk = None
+        new_record.catalog_number = 'new2'
+        new_record.save()
+        entry = Wishlist.objects.get(user=self.user, record_catalog_number='NEW2')
+        self.assertTrue(WishlistMatch.objects.filter(wishlist=entry, record=new_record).exists())
+
+    def test_import_wishlist_repeated(self):
+        """
+        Test that repeating an import inserts, matches and counts nothing again
+        """
+        self.client.force_authenticate(user=self.user)
+        payload = ['NEW-1', 'NEW2']
+
+        self.client.post(self.import_url, payload, format='json')
+        response = self.client.post(self.import_url, payload, format='json')
+
+        self.assertEqual(response.data, {'inserted': 0, 'skipped': 2})
+        self.assertEqual(CatalogCounter.objects.get(catalog_key='new1').wishlist_count, 1)
+        self.assertEqual(Wishlist.objects.filter(user=self.user).count(), 3)
+
+    def test_import_wishlist_matches_existing_records(self):
+        """
+        Test that imported entries are matched against existing records
+        """
+        self.client.force_authenticate(user=self.another_user)
+        Record.objects.filter(pk=self.record.pk).update(user=self.user)
+
+        response = self.client.post(
+            self.import_url, {'catalog_numbers': ['test001']}, format='json'
+        )
+
+        self.assertEqual(response.data, {'inserted': 1, 'skipped': 0})
+        entry = Wishlist.objects.get(user=self.another_user)
+        self.assertEqual(entry.catalog_key, 'test001')
+        self.assertTrue(WishlistMatch.objects.filter(wishlist=entry, record=self.record).exists())
+
+    def test_import_wishlist_csv(self):
+        """
+        Test importing catalog numbers from an uploaded CSV file
+        """
+        self.client.force_authenticate(user=self.user)
+        upload = SimpleUploadedFile(
+            'wishlist.csv',
+            b'record_catalog_number\nCSV-1\nCSV-2,extra column\n\nTEST001\n',
+            content_type='text/csv'
+        )
+
+        response = self.client.post(self.import_url, {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data, {'inserted': 2, 'skipped': 1})
+        self.assertEqual(Wishlist.objects.filter(user=self.user).count(), 3)
+
+    def test_import_wishlist_invalid(self):
+        """
+        Test importing without catalog numbers or unauthenticated
+        """
+        response = self.client.post(self.import_url, ['NEW1'], format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(self.import_url, {}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('message', response.data)
+        self.assertEqual(Wishlist.objects.count(), 1)
+
+    def test_catalog_counts(self):
+        """
+        Test reading the record and wishlist counts of a catalog number
+        """
+        response = self.client.get(self.counts_url, {'catalog_number': 'test-001'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['record_count'], 1)
+        self.assertEqual(response.data['wishlist_count'], 1)
+
+        response = self.client.get(self.counts_url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_catalog_counters_follow_changes(self):
+        """
+        Test that saving, renaming, importing and deleting update the counters
+        """
+        self.record.catalog_number = 'TEST002'
+        self.record.save()
+
+        self.assertEqual(
+            CatalogCounter.objects.get(catalog_key='test001').record_count, 0
+        )
+        self.assertEqual(
+            CatalogCounter.objects.get(catalog_key='test002').record_count, 1
+        )
+
+        self.client.force_authenticate(user=self.another_user)
+        self.client.post(self.import_url, ['TEST001', 'TEST-002'], format='json')
+        self.wishlist_item.delete()
+
+        counts = dict(CatalogCounter.objects.values_list('catalog_key', 'wishlist_count'))
+        self.assertEqual(counts, {'test001': 1, 'test002': 1})
+
+    def test_catalog_counts_in_record_output(self):
+        """
+        Test that serialized records include the counts of their catalog number
+        """
+        response = self.client.get(reverse('api:record-list'))
+
+        record = response.data['results'][0]
+        self.assertEqual(record['record_count'], 1)
+        self.assertEqual(record['wishlist_count'], 1)
+
+    def test_reconcile_catalog_counters(self):
+        """
+        Test that the reconcile command corrects drifted counters
+        """
+        CatalogCounter.objects.update(wishlist_count=5)
+        CatalogCounter.objects.create(catalog_key='orphan', record_count=2)
+
+        call_command('reconcile_catalog_counters', stdout=io.StringIO())
+
+        counts = list(CatalogCounter.objects.values_list('catalog_key', 'record_count', 'wishlist_count'))
+        self.assertEqual(counts, [('test001', 1, 1)])
+
+    def test_new_record_notifies_wishers_after_commit(self):
+        """
+        Test that a new record writes an outbox event that is dispatched
+        after the commit as one email per wisher
+        """
+        OutboxEvent.objects.all().delete()
+        third_user = User.objects.create_user(
+            email='third@example.com',
+            username='thirduser',
+            password='ThirdPass123!'
+        )
+        Wishlist.objects.create(user=third_user, record_catalog_number='NEW-100')
+        Wishlist.objects.create(user=self.user, record_catalog_number='new 100')
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            new_record = Record.objects.get(pk=self.record.pk)
+            new_record.pk = None
+            new_record.catalog_number = 'NEW100'
+            new_record.save()
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(len(mail.outbox), 0)
+        event = OutboxEvent.objects.get(event_type='record_created')
+        self.assertEqual(event.payload, {'record_id': new_record.id})
+
+        self.assertEqual(dispatch_pending(), 1)
+
+        event.refresh_from_db()
+        self.assertEqual(event.status, OutboxEvent.Status.DISPATCHED)
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            ['third@example.com', 'user@example.com']
+        )
+        self.assertIn('NEW100', mail.outbox[0].body)
+
+    def test_outbox_retries_failed_events(self):
+        """
+        Test that failed outbox events are retried with backoff and given up
+        after the maximum number of attempts
+        """
+        OutboxEvent.objects.all().delete()
+        event = OutboxEvent.objects.create(event_type='unknown_event')
+
+        self.assertEqual(dispatch_pending(), 1)
+
+        event.refresh_from_db()
+        self.assertEqual(event.status, OutboxEvent.Status.PENDING)
+        self.assertEqual(event.attempts, 1)
+        self.assertGreater(event.next_attempt_at, timezone.now())
+        self.assertIn('unknown_event', event.last_error)
+
+        # Not due again before the backoff delay has passed
+        self.assertEqual(dispatch_pending(), 0)
+
+        OutboxEvent.objects.filter(pk=event.pk).update(next_attempt_at=timezone.now())
+        with self.settings(OUTBOX_MAX_ATTEMPTS=2):
+            self.assertEqual(dispatch_pending(), 1)
+
+        event.refresh_from_db()
+        self.assertEqual(event.status, OutboxEvent.Status.FAILED)
+        self.assertEqual(event.attempts, 2)
+
+    def test_new_record_without_wishers_publishes_nothing(self):
+        """
+        Test that a record no wishlist entry matches writes no outbox event
+        """
+        OutboxEvent.objects.all().delete()
+
+        new_record = Record.objects.get(pk=self.record.pk)
+        new_record.pk = None
+        new_record.catalog_number = 'NOBODY-1'
+        new_record.save()
+
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_dispatch_outbox_purges_old_events(self):
+        """
+        Test that the dispatch_outbox command deletes events dispatched or
+        failed before their retention period and keeps the rest
+        """
+        OutboxEvent.objects.all().delete()
+        now = timezone.now()
+        old = now - timedelta(days=60)
+        OutboxEvent.objects.create(
+            event_type='old_dispatched', status=OutboxEvent.Status.DISPATCHED, dispatched_at=old
+        )
+        OutboxEvent.objects.create(
+            event_type='recent_dispatched', status=OutboxEvent.Status.DISPATCHED, dispatched_at=now
+        )
+        OutboxEvent.objects.create(
+            event_type='old_failed', status=OutboxEvent.Status.FAILED, next_attempt_at=old
+        )
+        OutboxEvent.objects.create(
+            event_type='recent_failed', status=OutboxEvent.Status.FAILED, next_attempt_at=now
+        )
+
+        call_command('dispatch_outbox', stdout=io.StringIO())
+
+        self.assertEqual(
+            sorted(OutboxEvent.objects.values_list('event_type', flat=True)),
+            ['recent_dispatched', 'recent_failed']
+        )
@@ -14,6 +14,12 @@ urlpatterns = [
 
    path('records/', RecordListView.as_view(), name='record-list'),
    path('records/create/', RecordCreateView.as_view(), name='record-add'),
+   path('records/search/', RecordSearchView.as_view(), name='record-search'),
+   path('records/lookup/', RecordFuzzyLookupView.as_view(), name='record-lookup'),
+   path('records/counts/', CatalogCountsView.as_view(), name='record-counts'),
+   path('records/nearby/', RecordNearbyView.as_view(), name='record-nearby'),
+   path('records/clusters/', RecordClusterView.as_view(), name='record-clusters'),
+   path('records/export/', RecordExportView.as_view(), name='record-export'),
    path('records/<int:id>/', RecordDetailView.as_view(), name='record-detail'),
    path('records/<int:id>/update/', RecordUpdateView.as_view(), name='record-update'),
    path('records/<int:id>/delete/', RecordDeleteView.as_view(), name='record-delete'),
@@ -26,9 +32,11 @@ urlpatterns = [
 
    path('locations/', LocationListView.as_view(), name='location-list'),
    path('locations/<int:id>/', LocationDetailView.as_view(), name='location-detail'),
+   path('locations/geocode-cache/', GeocodeCacheStatsView.as_view(), name='geocode-cache-stats'),
 
    path('wishlist/', WishlistListView.as_view(), name='wishlist-list'),
    path('wishlist/add/', WishlistCreateView.as_view(), name='wishlist-add'),
+   path('wishlist/import/', WishlistImportView.as_view(), name='wishlist-import'),
    path('wishlist/<int:id>/delete/', WishlistDeleteView.as_view(), name='wishlist-delete'),
 
    path('exchanges/', ExchangeListView.as_view(), name='exchange-list'),
@@ -1,6 +1,14 @@
+import hashlib
+
 from django.conf import settings
 from django.contrib.auth import login, logout
-from django.http import Http404, HttpResponseRedirect
+from django.contrib.gis.db.models.functions import Distance
+from django.contrib.gis.measure import D
+from django.contrib.postgres.search import SearchHeadline, SearchRank, TrigramSimilarity
+from django.core.cache import cache
+from django.db import connection
+from django.db.models.functions import Floor
+from django.http import Http404, HttpResponseRedirect, StreamingHttpResponse
 from django.middleware.csrf import get_token
 from django.shortcuts import get_object_or_404
 
@@ -13,7 +21,18 @@ from rest_framework.views import APIView
 from google.oauth2 import id_token
 from google.auth.transport import requests
 
+from .conditional import RECORDS_MARKER, ConditionalGetMixin, aggregate_state, marker_state
+from .counters import get_counts
+from .export import EXPORT_FORMATS, iter_export
+from .filters import RecordFilterBackend, build_search_query
+from .geo import (
+    PointX, PointY, as_geometry, filter_bbox, parse_bbox, parse_float_param, parse_point, snap_bbox
+)
+from .geocoding import cache_stats
 from .models import *
+from .pagination import (
+    LocationCursorPagination, RecordCursorPagination, RecordSearchPagination, WishlistCursorPagination
+)
 from .serializers import *
 
 
@@ -212,6 +231,27 @@ def custom_admin_logout(request):
     return HttpResponseRedirect(f"{settings.SITE_URL}")  # Redirect to admin login page
 
 
+def get_records_conditional_state():
+    """
+    Conditional GET state of record payloads: the records marker, which
+    moves forward with every change to records, their photos and
+    locations, the exchanges that decide their availability (see
+    api.signals) and the catalog counters (see api.counters).
+    """
+    return marker_state(RECORDS_MARKER)
+
+
+def get_exchanges_conditional_state(exchanges):
+    """
+    Conditional GET state of exchange payloads: the exchanges and, since they
+    embed records, the records marker.
+    """
+    exchange_count, exchanges_modified = aggregate_state(exchanges, 'last_modification_datetime')
+    records_version, records_modified = marker_state(RECORDS_MARKER)
+    last_modified = max(filter(None, [records_modified, exchanges_modified]), default=None)
+    return (exchange_count, exchanges_modified, records_version), last_modified
+
+
 class RecordCreateView(generics.CreateAPIView):
     """
     API endpoint for adding a new record along with associated photos.
@@ -228,25 +268,291 @@ class RecordCreateView(generics.CreateAPIView):
         return context
 
 
-class RecordListView(generics.ListAPIView):
+class RecordListView(ConditionalGetMixin, generics.ListAPIView):
     """
-    API endpoint for listing all records or filtering
-    (filtering hasn't been implemented)
+    API endpoint for listing all records, optionally filtered by
+    query parameters (see RecordFilterBackend).
+    Results are returned in pages addressed by opaque next/previous cursors.
     """
     permission_classes = [permissions.AllowAny]
     serializer_class = RecordSerializer
-    queryset = Record.objects.all()
-    
-    
-class RecordDetailView(generics.RetrieveAPIView):
+    pagination_class = RecordCursorPagination
+    filter_backends = [RecordFilterBackend]
+
+    def get_queryset(self):
+        fields = self.get_serializer_class().requested_fields(self.request)
+        return Record.objects.for_serialization(fields)
+
+    def get_conditional_state(self):
+        return get_records_conditional_state()
+
+
+class RecordSearchView(generics.ListAPIView):
+    """
+    API endpoint for full-text search over artist, album name and
+    description. Results are ordered by relevance and include a
+    highlighted snippet of the description.
+    """
+    permission_classes = [permissions.AllowAny]
+    serializer_class = RecordSearchSerializer
+    pagination_class = RecordSearchPagination
+    filter_backends = [RecordFilterBackend]
+    # The match on 'q' is applied here, next to the rank
+    handles_search = True
+
+    def get_queryset(self):
+        text = self.request.query_params.get('q', '').strip()
+        if not text:
+            raise ValidationError({
+                'message': "Query parameter 'q' is required."
+            })
+
+        query = build_search_query(text)
+        fields = self.get_serializer_class().requested_fields(self.request)
+        queryset = Record.objects.for_serialization(fields).filter(
+            search_vector=query
+        ).annotate(
+            rank=SearchRank(models.F('search_vector'), query)
+        ).order_by('-rank', 'id')
+
+        if fields is None or 'headline' in fields:
+            queryset = queryset.annotate(
+                headline=SearchHeadline(
+                    'additional_description',
+                    query,
+                    config='english',
+                    start_sel='<mark>',
+                    stop_sel='</mark>',
+                    max_words=35,
+                    min_words=15
+                )
+            )
+
+        return queryset
+
+
+class RecordNearbyView(generics.ListAPIView):
+    """
+    API endpoint for records available for exchange within 'radius'
+    kilometres of the point given by 'lat' and 'lon', nearest first.
+    The radius check is ST_DWithin on the geography column, which uses the
+    spatial index on location coordinates.
+    """
+    permission_classes = [permissions.AllowAny]
+    serializer_class = RecordNearbySerializer
+    pagination_class = RecordSearchPagination
+    filter_backends = [RecordFilterBackend]
+    default_radius_km = 25
+    max_radius_km = 500
+
+    def get_queryset(self):
+        params = self.request.query_params
+        point = parse_point(params)
+        radius = parse_float_param(
+            params, 'radius', 0, self.max_radius_km, default=self.default_radius_km
+        )
+
+        fields = self.get_serializer_class().requested_fields(self.request)
+        return Record.objects.for_serialization(fields).available().filter(
+            location__coordinates__dwithin=(point, D(km=radius))
+        ).annotate(
+            distance=Distance('location__coordinates', point)
+        ).order_by('distance', 'id')
+
+
+class RecordClusterView(APIView):
+    """
+    API endpoint for the record map: records available for exchange in the
+    'bbox' viewport, grouped into grid cells sized for the 'zoom' level.
+    Each cluster has its record count and the centroid of its records;
+    single-record clusters also carry the record id.
+    """
+    permission_classes = [permissions.AllowAny]
+    # The viewport is snapped to the cluster grid here rather than applied
+    # as given by RecordFilterBackend
+    handles_bbox = True
+    max_zoom = 20
+    # Roughly one cluster per 64 x 64 pixels of a 256 pixel map tile
+    cells_per_tile = 4
+
+    def get(self, request):
+        params = request.query_params
+        bbox = parse_bbox(params, required=True)
+        zoom = int(parse_float_param(params, 'zoom', 0, self.max_zoom))
+
+        cell_size = 360 / 2 ** zoom / self.cells_per_tile
+        # Whole cells only, so edge clusters do not depend on the exact
+        # viewport and panning reuses cached results
+        bbox = snap_bbox(bbox, cell_size)
+
+        filters = sorted((key, value) for key, value in params.lists() if key != 'bbox')
+        key = 'record-clusters:' + hashlib.md5(f'{zoom}|{bbox}|{filters}'.encode()).hexdigest()
+        clusters = cache.get(key)
+        if clusters is None:
+            clusters = self.get_clusters(bbox, cell_size)
+            if settings.RECORD_CLUSTER_CACHE_TIMEOUT:
+                cache.set(key, clusters, settings.RECORD_CLUSTER_CACHE_TIMEOUT)
+
+        return Response(
+            {'zoom': zoom, 'bbox': bbox, 'cell_size': cell_size, 'clusters': clusters},
+            status=status.HTTP_200_OK
+        )
+
+    def get_clusters(self, bbox, cell_size):
+        queryset = filter_bbox(Record.objects.available(), 'location__coordinates', bbox)
+        queryset = RecordFilterBackend().filter_queryset(self.request, queryset, self)
+
+        geometry = as_geometry('location__coordinates')
+        rows = queryset.alias(
+            longitude=PointX(geometry),
+            latitude=PointY(geometry)
+        ).annotate(
+            cell_x=Floor(models.F('longitude') / cell_size),
+            cell_y=Floor(models.F('latitude') / cell_size)
+        ).values('cell_x', 'cell_y').annotate(
+            count=models.Count('id'),
+            centroid_longitude=models.Avg('longitude'),
+            centroid_latitude=models.Avg('latitude'),
+            record_id=models.Min('id')
+        ).order_by()
+
+        clusters = []
+        for row in rows:
+            cluster = {
+                'latitude': round(row['centroid_latitude'], 6),
+                'longitude': round(row['centroid_longitude'], 6),
+                'count': row['count'],
+            }
+            if row['count'] == 1:
+                cluster['record_id'] = row['record_id']
+            clusters.append(cluster)
+        return clusters
+
+
+class CatalogCountsView(APIView):
+    """
+    API endpoint with the number of records and wishlist entries for a
+    catalog number (`?catalog_number=`), read from its catalog counter.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        catalog_number = request.query_params.get('catalog_number', '').strip()
+        if not normalize_catalog_number(catalog_number):
+            return Response(
+                {'message': "Query parameter 'catalog_number' is required."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        record_count, wishlist_count = get_counts(catalog_number)
+        return Response({
+            'catalog_number': catalog_number,
+            'record_count': record_count,
+            'wishlist_count': wishlist_count,
+        }, status=status.HTTP_200_OK)
+
+
+class RecordFuzzyLookupView(APIView):
+    """
+    API endpoint for typo-tolerant ("did you mean") lookups of catalog
+    numbers and artists, ordered by trigram similarity.
+    """
+    permission_classes = [permissions.AllowAny]
+    default_threshold = 0.3
+    max_results = 10
+
+    def get(self, request):
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            return Response(
+                {'message': "Query parameter 'q' is required."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            threshold = float(request.query_params.get('threshold', self.default_threshold))
+        except ValueError:
+            threshold = -1
+        if not 0 < threshold <= 1:
+            return Response(
+                {'message': "Query parameter 'threshold' must be a number between 0 and 1."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        with transaction.atomic():
+            # The trigram_similar lookup (% operator) can use the trigram
+            # indexes; it compares against this transaction-local threshold.
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT set_config('pg_trgm.similarity_threshold', %s, true)",
+                    [str(threshold)]
+                )
+
+            catalog_numbers = list(
+                Record.objects.filter(catalog_number__trigram_similar=text)
+                .annotate(similarity=TrigramSimilarity('catalog_number', text))
+                .values('catalog_number', 'similarity')
+                .distinct()
+                .order_by('-similarity', 'catalog_number')[:self.max_results]
+            )
+
+            artists = list(
+                Record.objects.filter(artist__trigram_similar=text)
+                .annotate(similarity=TrigramSimilarity('artist', text))
+                .values('artist', 'similarity')
+                .distinct()
+                .order_by('-similarity', 'artist')[:self.max_results]
+            )
+
+        return Response(
+            {'catalog_numbers': catalog_numbers, 'artists': artists},
+            status=status.HTTP_200_OK
+        )
+
+
+class RecordExportView(APIView):
+    """
+    API endpoint streaming every record as NDJSON (default) or CSV
+    (?type=csv). Rows are encoded while they are read, so memory use stays
+    constant and the first bytes are sent before the whole table is scanned.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    content_types = {
+        'ndjson': 'application/x-ndjson',
+        'csv': 'text/csv',
+    }
+
+    def get(self, request):
+        export_format = request.query_params.get('type', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {'message': f"Query parameter 'type' must be one of: {', '.join(EXPORT_FORMATS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        response = StreamingHttpResponse(
+            iter_export(export_format),
+            content_type=self.content_types[export_format]
+        )
+        response['Content-Disposition'] = f'attachment; filename="records.{export_format}"'
+        return response
+
+
+class RecordDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
     """
     API endpoint for retrieving a single record by ID.
     """
     permission_classes = [permissions.AllowAny]
     serializer_class = RecordSerializer
-    queryset = Record.objects.all()
     lookup_field = 'id'
 
+    def get_queryset(self):
+        fields = self.get_serializer_class().requested_fields(self.request)
+        return Record.objects.for_serialization(fields)
+
+    def get_conditional_state(self):
+        return get_records_conditional_state()
+
 
 class RecordUpdateView(generics.UpdateAPIView):
     """
@@ -300,9 +606,20 @@ class RecordDeleteView(generics.DestroyAPIView):
 
 
 class LocationListView(generics.ListCreateAPIView):
-    queryset = Location.objects.all()
+    """
+    API endpoint for listing locations, optionally only those inside the
+    map viewport given by ?bbox=min_lon,min_lat,max_lon,max_lat.
+    """
     serializer_class = LocationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = LocationCursorPagination
+
+    def get_queryset(self):
+        queryset = Location.objects.all()
+        bbox = parse_bbox(self.request.query_params)
+        if bbox is not None:
+            queryset = filter_bbox(queryset, 'coordinates', bbox)
+        return queryset
 
 
 class LocationDetailView(generics.RetrieveAPIView):
@@ -311,21 +628,40 @@ class LocationDetailView(generics.RetrieveAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
 
-class UserRecordListView(generics.ListAPIView):
+class GeocodeCacheStatsView(APIView):
     """
-    API endpoint for listing all records of a specific user.
+    API endpoint with reverse geocoding cache hit/miss counters of the
+    serving process.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(cache_stats(), status=status.HTTP_200_OK)
+
+
+class UserRecordListView(ConditionalGetMixin, generics.ListAPIView):
+    """
+    API endpoint for listing all records of a specific user, optionally
+    filtered by query parameters (see RecordFilterBackend).
+    Results are returned in pages addressed by opaque next/previous cursors.
     """
     permission_classes = [permissions.AllowAny]
     serializer_class = RecordSerializer
+    pagination_class = RecordCursorPagination
+    filter_backends = [RecordFilterBackend]
 
     def get_queryset(self):
         user_id = self.kwargs.get('user_id')
         if not user_id or not str(user_id).isdigit():
             raise Http404('Invalid user_id. It must be an integer.')
-        return Record.objects.filter(user_id=int(user_id))
-    
+        fields = self.get_serializer_class().requested_fields(self.request)
+        return Record.objects.for_serialization(fields).filter(user_id=int(user_id))
 
-class GenreListView(generics.ListAPIView):
+    def get_conditional_state(self):
+        return get_records_conditional_state()
+
+
+class GenreListView(ConditionalGetMixin, generics.ListAPIView):
     """
     API endpoint for listing all available genres.
     """
@@ -333,8 +669,12 @@ class GenreListView(generics.ListAPIView):
     serializer_class = GenreSerializer
     queryset = Genre.objects.all()
 
+    def get_conditional_state(self):
+        state = aggregate_state(Genre.objects.all(), 'updated_at')
+        return state, state[1]
 
-class GoldmineConditionRecordListView(generics.ListAPIView):
+
+class GoldmineConditionRecordListView(ConditionalGetMixin, generics.ListAPIView):
     """
     API endpoint for listing all record Goldmine Condition.
     """
@@ -342,8 +682,12 @@ class GoldmineConditionRecordListView(generics.ListAPIView):
     serializer_class = GoldmineConditionRecordSerializer
     queryset = GoldmineConditionRecord.objects.all()
 
+    def get_conditional_state(self):
+        state = aggregate_state(GoldmineConditionRecord.objects.all(), 'updated_at')
+        return state, state[1]
+
 
-class GoldmineConditionCoverListView(generics.ListAPIView):
+class GoldmineConditionCoverListView(ConditionalGetMixin, generics.ListAPIView):
     """
     API endpoint for listing all cover Goldmine Condition.
     """
@@ -351,19 +695,26 @@ class GoldmineConditionCoverListView(generics.ListAPIView):
     serializer_class = GoldmineConditionCoverSerializer
     queryset = GoldmineConditionCover.objects.all()
 
+    def get_conditional_state(self):
+        state = aggregate_state(GoldmineConditionCover.objects.all(), 'updated_at')
+        return state, state[1]
+
 
 class WishlistListView(generics.ListAPIView):
     """
     API endpoint for listing the authenticated user's wishlist items.
+    Matching records are read from the match table for a whole page at once.
     """
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = WishlistSerializer
+    pagination_class = WishlistCursorPagination
 
     def get_queryset(self):
         """
         Return wishlist items belonging to the authenticated user.
         """
-        return Wishlist.objects.filter(user=self.request.user)
+        fields = self.get_serializer_class().requested_fields(self.request)
+        return Wishlist.objects.filter(user=self.request.user).for_serialization(fields)
 
 
 class WishlistCreateView(generics.CreateAPIView):
@@ -382,6 +733,25 @@ class WishlistCreateView(generics.CreateAPIView):
         return context
 
 
+class WishlistImportView(APIView):
+    """
+    API endpoint for adding many catalog numbers to the user's wishlist at
+    once. Accepts a JSON list of catalog numbers (or an object with a
+    `catalog_numbers` list) or a CSV upload in the `file` field.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        data = request.data
+        if isinstance(data, list):
+            data = {'catalog_numbers': data}
+
+        serializer = WishlistImportSerializer(data=data, context={'user': request.user})
+        serializer.is_valid(raise_exception=True)
+        result = serializer.save()
+        return Response(result, status=status.HTTP_201_CREATED)
+
+
 class WishlistDeleteView(generics.DestroyAPIView):
     """
     API endpoint for removing an item from the user's wishlist.
@@ -402,7 +772,7 @@ class WishlistDeleteView(generics.DestroyAPIView):
         instance.delete()
     
 
-class ExchangeListView(generics.ListAPIView):
+class ExchangeListView(ConditionalGetMixin, generics.ListAPIView):
     """
     API endpoint for listing all exchanges.
     """
@@ -414,20 +784,37 @@ class ExchangeListView(generics.ListAPIView):
         Return only exchanges where the user is the initiator or receiver.
         """
         user = self.request.user
-        return Exchange.objects.filter(
+        fields = self.get_serializer_class().requested_fields(self.request)
+        return Exchange.objects.for_serialization(fields).filter(
             models.Q(initiator_user=user) | models.Q(receiver_user=user)
         )
 
+    def get_conditional_state(self):
+        user = self.request.user
+        return get_exchanges_conditional_state(
+            Exchange.objects.filter(
+                models.Q(initiator_user=user) | models.Q(receiver_user=user)
+            )
+        )
+
 
-class ExchangeRetrieveView(generics.RetrieveAPIView):
+class ExchangeRetrieveView(ConditionalGetMixin, generics.RetrieveAPIView):
     """
     API endpoint for retrieving a single exchange.
     """
-    queryset = Exchange.objects.all()
     serializer_class = ExchangeSerializer
     permission_classes = [permissions.IsAuthenticated]
     lookup_field = 'id'
 
+    def get_queryset(self):
+        fields = self.get_serializer_class().requested_fields(self.request)
+        return Exchange.objects.for_serialization(fields)
+
+    def get_conditional_state(self):
+        return get_exchanges_conditional_state(
+            Exchange.objects.filter(id=self.kwargs.get('id'))
+        )
+
     def get_object(self):
         """
         Ensure only the initiator or receiver can access the exchange details.
@@ -435,7 +822,7 @@ class ExchangeRetrieveView(generics.RetrieveAPIView):
         exchange = super().get_object()
         user = self.request.user
 
-        if user not in [exchange.initiator_user, exchange.receiver_user]:
+        if user.id not in [exchange.initiator_user_id, exchange.receiver_user_id]:
             raise PermissionDenied({
                 "message": "You do not have permission to view this exchange."
             })
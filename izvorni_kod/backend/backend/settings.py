@@ -53,6 +53,7 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'django.contrib.sites',
     'django.contrib.gis',
+    'django.contrib.postgres',
     'api',
     'corsheaders',
     'rest_framework',
@@ -165,6 +166,28 @@ SESSION_COOKIE_SAMESITE = 'None'
 SESSION_COOKIE_SECURE = True
 
 
+# Caches
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Rendered RecordSerializer fragments, keyed by record id and version.
+    # The local-memory backend evicts the least recently used entries once
+    # MAX_ENTRIES is reached.
+    'records': {
+        'BACKEND': env('RECORD_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': env('RECORD_CACHE_LOCATION', default='record-fragments'),
+        'TIMEOUT': env.int('RECORD_CACHE_TIMEOUT', default=3600),
+        'OPTIONS': {
+            'MAX_ENTRIES': env.int('RECORD_CACHE_MAX_ENTRIES', default=10000),
+            'CULL_FREQUENCY': 10,
+        },
+    },
+}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
 
@@ -216,3 +239,52 @@ EMAIL_HOST_USER = env('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = env('EMAIL_HOST_PASSWORD', default='')
 DEFAULT_FROM_EMAIL = env('DEFAULT_FROM_EMAIL', default='Record Exchange <noreply@example.com>')
 SITE_URL = env('SITE_URL', default='http://localhost:8000')
+# Notification emails are sent in batches of up to this many messages over
+# one connection of the email backend
+EMAIL_BATCH_SIZE = env.int('EMAIL_BATCH_SIZE', default=100)
+
+
+# GEOCODING SETTINGS
+# Reverse geocoding results are cached per coordinates rounded to this many
+# decimal places (3 places is roughly 100 m).
+GEOCODE_CACHE_PRECISION = env.int('GEOCODE_CACHE_PRECISION', default=3)
+GEOCODE_CACHE_SIZE = env.int('GEOCODE_CACHE_SIZE', default=1024)
+
+# Geocoder used for locations: 'api.geocoders.NominatimGeocoder' (OpenStreetMap,
+# rate limited) or 'api.geocoders.GazetteerGeocoder' (offline, reads a
+# GeoNames cities dump such as cities15000.txt and optionally countryInfo.txt).
+GEOCODER_BACKEND = env('GEOCODER_BACKEND', default='api.geocoders.NominatimGeocoder')
+GEOCODER_GAZETTEER_PATH = env('GEOCODER_GAZETTEER_PATH', default='')
+GEOCODER_COUNTRY_INFO_PATH = env('GEOCODER_COUNTRY_INFO_PATH', default='')
+
+# Locations whose coordinates share a geohash of this length are stored once
+# (8 characters is a cell of roughly 38 m x 19 m).
+LOCATION_GRID_PRECISION = env.int('LOCATION_GRID_PRECISION', default=8)
+
+# Seconds map clusters (records/clusters/) are cached per zoom level and
+# snapped viewport; 0 disables caching.
+RECORD_CLUSTER_CACHE_TIMEOUT = env.int('RECORD_CLUSTER_CACHE_TIMEOUT', default=60)
+
+# Requests per second allowed to remote geocoders, shared by all processes,
+# and the longest a caller waits for its turn before giving up.
+GEOCODER_RATE_LIMIT = env.float('GEOCODER_RATE_LIMIT', default=1.0)
+GEOCODER_RATE_LIMIT_TIMEOUT = env.float('GEOCODER_RATE_LIMIT_TIMEOUT', default=30.0)
+
+
+# OUTBOX SETTINGS
+# Events written by api.signals are dispatched by a background thread right
+# after their transaction commits (unless OUTBOX_DISPATCH_ON_COMMIT is off)
+# and by the dispatch_outbox worker. A dispatcher holds an event for
+# OUTBOX_LEASE seconds while sending it. Failed events are retried after
+# OUTBOX_RETRY_DELAY seconds, doubled per attempt up to
+# OUTBOX_MAX_RETRY_DELAY, and given up after OUTBOX_MAX_ATTEMPTS. The
+# dispatch_outbox worker deletes dispatched events after
+# OUTBOX_RETENTION_DAYS and failed ones after OUTBOX_FAILED_RETENTION_DAYS.
+OUTBOX_DISPATCH_ON_COMMIT = env.bool('OUTBOX_DISPATCH_ON_COMMIT', default=True)
+OUTBOX_BATCH_SIZE = env.int('OUTBOX_BATCH_SIZE', default=100)
+OUTBOX_MAX_ATTEMPTS = env.int('OUTBOX_MAX_ATTEMPTS', default=8)
+OUTBOX_LEASE = env.float('OUTBOX_LEASE', default=300.0)
+OUTBOX_RETRY_DELAY = env.float('OUTBOX_RETRY_DELAY', default=30.0)
+OUTBOX_MAX_RETRY_DELAY = env.float('OUTBOX_MAX_RETRY_DELAY', default=3600.0)
+OUTBOX_RETENTION_DAYS = env.int('OUTBOX_RETENTION_DAYS', default=7)
+OUTBOX_FAILED_RETENTION_DAYS = env.int('OUTBOX_FAILED_RETENTION_DAYS', default=30)
@@ -5,6 +5,7 @@ import { useNavigate } from "react-router-dom";
 import { useUser } from "../../contexts/UserContext";
 import FormLogin from './FormLogin';
 import { useAuthRefresh } from '../../contexts/AuthRefresh';
+import { fetchAllPages } from '../../utils/paginationUtils';
 
 
 
@@ -50,13 +51,9 @@ function ExchangeForm({ selectedVinylId, onClose }) {
     useEffect(() => {
         const fetchVinyls = async () => {
           try {
-            const response = await authFetch(`${URL}/api/records/user/${userId}`, {
+            const data = await fetchAllPages(authFetch, `${URL}/api/records/user/${userId}/`, {
               method: "GET",
-            });    
-            if (!response.ok) {
-              throw new Error("Failed to fetch vinyls");
-            }    
-            const data = await response.json();
+            });
     
             setUserVinyls(data);
             setLoading(false);
@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate } from "react-router-dom";
 import { useAuthRefresh } from "../../contexts/AuthRefresh";
+import { fetchAllPages } from "../../utils/paginationUtils";
 import './Form.css';
 
 const URL = import.meta.env.VITE_API_URL;
@@ -36,13 +37,9 @@ function RequestRecordForm({ exchange, onClose, onSuccess}) {
     useEffect(() => {
         const fetchVinyls = async () => {
             try {
-                const response = await authFetch(`${URL}/api/records/user/${initiatorId}`, {
+                const data = await fetchAllPages(authFetch, `${URL}/api/records/user/${initiatorId}/`, {
                     method: "GET",
                 });
-                if (!response.ok) {
-                    throw new Error("Failed to fetch vinyls");
-                }
-                const data = await response.json();
                 
                 setUserVinyls(data);
                 setLoading(false);
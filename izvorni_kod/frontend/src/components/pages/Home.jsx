@@ -1,84 +1,80 @@
 import AddVinyl from "../AddVinyl";
 import AllVinyls from "../AllVinyls";
 import { useUser } from "../../contexts/UserContext"; // Import the user context
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useRef } from "react";
 
 const URL = import.meta.env.VITE_API_URL;
 
+// Wait this long after the last keystroke before searching
+const SEARCH_DELAY_MS = 300;
+
 
 export default function Home({ searchQuery, filters }) {
   const { user } = useUser();
   const [vinyls, setVinyls] = useState([]);
+  const [nextPage, setNextPage] = useState(null);
   const [loading, setLoading] = useState(true);
   const [errorMessage, setErrorMessage] = useState("");
+  const [debouncedQuery, setDebouncedQuery] = useState(searchQuery);
+  // Controller of the request in flight, aborted when a newer one starts
+  const requestRef = useRef(null);
+
+  useEffect(() => {
+    const timer = setTimeout(() => setDebouncedQuery(searchQuery), SEARCH_DELAY_MS);
+    return () => clearTimeout(timer);
+  }, [searchQuery]);
 
-  const filterFunction = (vinyls) => {
-    return vinyls.filter((vinyl) => {
-      console.log(vinyl);
-      const albumName = (vinyl.album_name || "").toLowerCase();
-      const artist = (vinyl.artist || "").toLowerCase();
-      const genre = (vinyl.genre.id || "") ;
-      const searchTerm = searchQuery.toLowerCase();
-      // Search
-      const searchMatch =
-        !searchQuery ||
-        albumName.includes(searchTerm) ||
-        artist.includes(searchTerm);
-      // Filters
-      const artistMatch =
-        !filters.artist || artist.includes(filters.artist.toLowerCase());
-      const yearMatch =
-        !filters.release_year ||
-        vinyl.release_year === parseInt(filters.release_year);
-      const genreMatch =
-        !filters.genre || genre === parseInt(filters.genre);
-      const exchangeMatch =
-        !filters.available_for_exchange ||
-        vinyl.available_for_exchange === true;
-      const coverMatch =
-        !filters.cover_condition ||
-        vinyl.cover_condition.id === parseInt(filters.cover_condition);
-      const recordMatch =
-        !filters.record_condition ||
-        vinyl.record_condition.id === parseInt(filters.record_condition);
+  // Translate the search query and filter panel state into query parameters
+  const buildQueryString = () => {
+    const params = new URLSearchParams();
 
-      return (
-        searchMatch &&
-        artistMatch &&
-        yearMatch &&
-        genreMatch &&
-        exchangeMatch &&
-        coverMatch &&
-        recordMatch
-      );
-    });
+    // Only request the fields shown on the vinyl cards
+    params.append("fields", "id,album_name,artist,user,available_for_exchange");
+    if (debouncedQuery) params.append("q", debouncedQuery);
+    if (filters.artist) params.append("artist", filters.artist);
+    if (filters.release_year) params.append("release_year", filters.release_year);
+    if (filters.genre) params.append("genre", filters.genre);
+    if (filters.cover_condition) params.append("cover_condition", filters.cover_condition);
+    if (filters.record_condition) params.append("record_condition", filters.record_condition);
+    if (filters.available_for_exchange) params.append("available_for_exchange", "true");
+
+    return params.toString();
   };
-  // Fetch all vinyls when the component mounts
-  useEffect(() => {
-    const fetchVinyls = async () => {
-      try {
-        const response = await fetch(`${URL}/api/records/`, {
-          method: "GET",
-        });
 
-        if (!response.ok) {
-          throw new Error("Failed to fetch vinyls");
-        }
+  // Fetch a page of vinyls; without a cursor URL the first page is loaded
+  const fetchVinyls = async (pageUrl = null) => {
+    requestRef.current?.abort();
+    const controller = new AbortController();
+    requestRef.current = controller;
+
+    try {
+      const response = await fetch(pageUrl || `${URL}/api/records/?${buildQueryString()}`, {
+        method: "GET",
+        signal: controller.signal,
+      });
 
-        const data = await response.json();
-        setVinyls(data);
-        setLoading(false);
-      } catch (error) {
-        console.error("Error fetching vinyls:", error);
-        setErrorMessage("Failed to load vinyl records. Please try again.");
-        setLoading(false);
+      if (!response.ok) {
+        throw new Error("Failed to fetch vinyls");
       }
-    };
 
-    fetchVinyls();
-  }, []);
+      const data = await response.json();
+      setVinyls((prevVinyls) => pageUrl ? [...prevVinyls, ...data.results] : data.results);
+      setNextPage(data.next);
+      setLoading(false);
+    } catch (error) {
+      // Superseded by a newer search; its results are no longer wanted
+      if (error.name === "AbortError") return;
+      console.error("Error fetching vinyls:", error);
+      setErrorMessage("Failed to load vinyl records. Please try again.");
+      setLoading(false);
+    }
+  };
 
-  const filteredVinyls = filterFunction ? filterFunction(vinyls) : vinyls;
+  // Fetch the first matching page whenever the search or filters change
+  useEffect(() => {
+    fetchVinyls();
+    return () => requestRef.current?.abort();
+  }, [debouncedQuery, filters]);
 
   if (loading) {
     return <div>Loading...</div>;
@@ -91,15 +87,20 @@ export default function Home({ searchQuery, filters }) {
   return (
     <div>
       {!user?.username ? (
-        <AllVinyls filteredVinyls={filteredVinyls} />
+        <AllVinyls filteredVinyls={vinyls} />
       ) : (
         <>
           <AddVinyl 
             onAddItem={(newItem) => { console.log(newItem); setVinyls((prevVinyls) => [...prevVinyls, newItem])}}
           />
-          <AllVinyls filteredVinyls={filteredVinyls} />
+          <AllVinyls filteredVinyls={vinyls} />
         </>
       )}
+      {nextPage && (
+        <button className="load-more-button" onClick={() => fetchVinyls(nextPage)}>
+          Load more
+        </button>
+      )}
     </div>
   );  
 }
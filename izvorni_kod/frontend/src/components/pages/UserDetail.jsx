@@ -3,6 +3,7 @@ import exchange from "../../assets/images/exchange.png";
 import { useParams, useNavigate } from 'react-router-dom';
 import ExchangeForm from "../forms/ExchangeForm";
 import { useUser } from "../../contexts/UserContext";
+import { fetchAllPages } from "../../utils/paginationUtils";
 import "./UserDetail.css";
 
 const URL = import.meta.env.VITE_API_URL;
@@ -35,14 +36,10 @@ function UserDetail() {
     
     const fetchVinyls = async () => {
       try {
-        const response = await fetch(`${URL}/api/records/user/${id}`, {
+        const data = await fetchAllPages(fetch, `${URL}/api/records/user/${id}/`, {
           method: "GET",
           credentials: "include",
         });
-        if (!response.ok) {
-          throw new Error("Failed to fetch vinyls");
-        }
-        const data = await response.json();
         setVinyls(data);
         setLoading(false);
       } catch (error) {
@@ -6,6 +6,7 @@ import FormWishlistAdd from "../forms/FormWishlistAdd";
 import { useAuthRefresh } from '../../contexts/AuthRefresh';
 import "./Wishlist.css";
 import { useNavigate } from "react-router-dom";
+import { fetchAllPages } from "../../utils/paginationUtils";
 
 
 const URL = import.meta.env.VITE_API_URL;
@@ -63,15 +64,9 @@ export default function Wishlist() {
         }
         const token = localStorage.getItem("access");
 
-        const response = await authFetch(`${URL}/api/wishlist/`, {
+        const data = await fetchAllPages(authFetch, `${URL}/api/wishlist/`, {
           method: "GET",
         });
-
-        if (!response.ok) {
-          throw new Error("Failed to fetch from wishlist");
-        }
-
-        const data = await response.json();
         setWishlist(data);
         setLoading(false);
       } catch (error) {
@@ -6,6 +6,7 @@ import { useNavigate } from "react-router-dom";
 import DeleteForm from "../forms/DeleteForm";
 import EditForm from "../forms/EditForm";
 import { useAuthRefresh } from '../../contexts/AuthRefresh';
+import { fetchAllPages } from "../../utils/paginationUtils";
 
 const URL = import.meta.env.VITE_API_URL;
 
@@ -60,14 +61,10 @@ function MyVinyls() {
           navigate('/');
           return;
         }
-        const response = await authFetch(`${URL}/api/records/user/${user.id}`, {
+        const data = await fetchAllPages(authFetch, `${URL}/api/records/user/${user.id}/`, {
           method: "GET",
           credentials: "include",
         });
-        if (!response.ok) {
-          throw new Error("Failed to fetch vinyls");
-        }
-        const data = await response.json();
         setVinyls(data);
         setLoading(false);
       } catch (error) {
@@ -0,0 +1,19 @@
+// Follows the `next` cursor of a paginated endpoint and collects every page.
+export const fetchAllPages = async (fetchFn, url, options = {}) => {
+  const results = [];
+  let nextUrl = url;
+
+  while (nextUrl) {
+    const response = await fetchFn(nextUrl, options);
+
+    if (!response.ok) {
+      throw new Error("Failed to fetch page");
+    }
+
+    const data = await response.json();
+    results.push(...data.results);
+    nextUrl = data.next;
+  }
+
+  return results;
+};